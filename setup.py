@@ -11,7 +11,14 @@ setup(
         "langgraph>=0.0.10",
         "python-dotenv>=1.0.0",
         "openai>=1.10.0",
+        "orjson>=3.9.0",
+        "httpx[http2]>=0.25.0",
         "pytest>=7.4.0",
         "pytest-asyncio>=0.23.0"
-    ]
+    ],
+    extras_require={
+        "test": [
+            "pytest-xdist>=3.5.0"
+        ]
+    }
 )
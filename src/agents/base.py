@@ -1,54 +1,118 @@
 """Base agent implementation for recursive project development."""
 from typing import Dict, List, Optional, Any
-import json
+import asyncio
+import orjson
+import os
+import importlib.util
 import datetime
 import logging
 from pathlib import Path
 
+import httpx
+import openai
 from langchain_openai import ChatOpenAI
 
-# Set up logging
+# Set up logging; the handler is attached on first use rather than at import
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-# Remove existing handlers
-for handler in logger.handlers[:]:
-    logger.removeHandler(handler)
+def _configure_logging() -> None:
+    """Attach the console handler once, however often the module is used."""
+    if logger.handlers:
+        return
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+    logger.addHandler(console_handler)
 
-# Create console handler with custom formatter
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
-logger.addHandler(console_handler)
-
-from ..config import get_agent_config, STATE_FILE, HISTORY_FILE, PROJECT_ROOT
+from ..config import (
+    get_agent_config, STATE_FILE, HISTORY_FILE, HISTORY_DB_FILE, PROJECT_ROOT, LLM_MAX_ASYNC, LLM_CACHE_TTL
+)
 from ..state.schema import ProjectState, CodeGenerationStatus
 from ..workflows.ai_workflow import AIControlledWorkflow
+from ..workflows.llm_cache import LLMCache
+
+# Chat models and response caches shared by every agent created with the same configuration
+_llm_pool: Dict[bytes, ChatOpenAI] = {}
+_llm_caches: Dict[bytes, LLMCache] = {}
+_http_async_client: Optional[httpx.AsyncClient] = None
+
+def _config_key(config: Dict[str, Any]) -> bytes:
+    """Get a key identifying an agent configuration."""
+    return orjson.dumps(config, option=orjson.OPT_SORT_KEYS, default=str)
+
+def _shared_http_async_client() -> Optional[httpx.AsyncClient]:
+    """Get the HTTP/2 client shared by all chat models, if HTTP/2 is available.
+
+    Without the h2 package, None is returned and langchain-openai's own cached
+    HTTP/1.1 client is used instead.
+    """
+    global _http_async_client
+    if _http_async_client is None and importlib.util.find_spec("h2") is not None:
+        _http_async_client = openai.DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=128, max_keepalive_connections=64)
+        )
+    return _http_async_client
+
+def get_shared_llm(config: Dict[str, Any]) -> ChatOpenAI:
+    """Get the chat model for a configuration, creating it on first use.
+
+    Agents created with the same configuration share one model, and with it
+    the client's connection pool, so concurrent calls reuse open connections
+    instead of each performing their own TLS handshake.
+    """
+    key = _config_key(config)
+    llm = _llm_pool.get(key)
+    if llm is None:
+        http_async_client = _shared_http_async_client()
+        if http_async_client is not None and "http_async_client" not in config:
+            config = {**config, "http_async_client": http_async_client}
+        llm = _llm_pool[key] = ChatOpenAI(**config)
+    return llm
+
+def get_shared_llm_cache(config: Dict[str, Any]) -> LLMCache:
+    """Get the LLM response cache for a configuration, creating it on first use.
+
+    Agents created with the same configuration share their cached responses,
+    so a request repeated by a new agent is answered without calling the LLM.
+    Responses expire after LLM_CACHE_TTL seconds.
+    """
+    key = _config_key(config)
+    cache = _llm_caches.get(key)
+    if cache is None:
+        cache = _llm_caches[key] = LLMCache(ttl=LLM_CACHE_TTL)
+    return cache
 
 class RecursiveAgent:
     """Agent that recursively develops and enhances software projects."""
     
     def __init__(self, config_overrides: Optional[Dict] = None):
         """Initialize the recursive agent with optional configuration overrides."""
+        _configure_logging()
         self.config = get_agent_config(config_overrides)
-        self.llm = ChatOpenAI(**self.config)
+        self.llm = get_shared_llm(self.config)
         
         # Initialize AI-controlled workflow
         try:
-            self.workflow = AIControlledWorkflow(self.llm)
+            # Responses are only cached when a lifetime is configured
+            self.workflow = AIControlledWorkflow(
+                self.llm,
+                llm_cache=get_shared_llm_cache(self.config) if LLM_CACHE_TTL > 0 else None
+            )
             logger.info("AI-controlled workflow initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize workflow: {e}")
+            logger.error("Failed to initialize workflow: %s", e)
             raise
         
         # Initialize state and history
         self.state = self._load_state()
-        self.history = self._load_history()
+        self._load_history()
     
     def _load_state(self) -> ProjectState:
         """Load the current project state."""
         try:
             if STATE_FILE.exists():
-                data = json.loads(STATE_FILE.read_text())
+                data = orjson.loads(STATE_FILE.read_bytes())
                 # Create new state with loaded data
                 return ProjectState(
                     status=CodeGenerationStatus(data.get("status", "initial")),
@@ -62,74 +126,115 @@ class RecursiveAgent:
                     original_requirements=""
                 )
         except Exception as e:
-            logger.error(f"Error loading state, initializing new: {e}")
+            logger.error("Error loading state, initializing new: %s", e)
             return ProjectState(
                 status=CodeGenerationStatus.INITIAL,
                 original_requirements=""
             )
     
-    def _load_history(self) -> List[Dict]:
-        """Load the development history."""
-        if HISTORY_FILE.exists():
-            return json.loads(HISTORY_FILE.read_text())
-        return []
+    def _load_history(self):
+        """Load the development history.
+        
+        Entries are kept only in encoded form: they embed full state dumps, so
+        a decoded copy would double the memory the history takes, and the bytes
+        are what gets saved anyway.
+        """
+        history = orjson.loads(HISTORY_FILE.read_bytes()) if HISTORY_FILE.exists() else []
+        self._history_blobs = [orjson.dumps(entry, default=str) for entry in history]
+        # The file is rewritten once in the layout new entries are appended to
+        self._history_file_synced = False
+    
+    @property
+    def history(self) -> List[Dict]:
+        """The development history, decoded from its encoded entries."""
+        return [orjson.loads(blob) for blob in self._history_blobs]
     
-    def _save_state(self):
-        """Save the current project state."""
-        STATE_FILE.write_text(json.dumps(self.state.model_dump(), indent=2))
+    def _save_state(self, state_dump: Optional[Dict] = None):
+        """Save the current project state, or an already dumped copy of it."""
+        if state_dump is None:
+            state_dump = self.state.model_dump()
+        STATE_FILE.write_bytes(orjson.dumps(state_dump, default=str, option=orjson.OPT_INDENT_2))
     
     def _save_history(self):
         """Save the development history."""
-        HISTORY_FILE.write_text(json.dumps(self.history, indent=2))
+        HISTORY_FILE.write_bytes(b"[" + b",\n".join(self._history_blobs) + b"]")
+        self._history_file_synced = True
+    
+    def _append_to_saved_history(self, blob: bytes):
+        """Append an encoded entry to the saved history without rewriting the file."""
+        if not self._history_file_synced or len(self._history_blobs) == 1 or not HISTORY_FILE.exists():
+            self._save_history()
+            return
+        with HISTORY_FILE.open("r+b") as history_file:
+            # Overwrite the closing bracket of the array with the new entry
+            history_file.seek(-1, os.SEEK_END)
+            history_file.write(b",\n" + blob + b"]")
     
     def _add_to_history(self, action: str, details: Dict):
         """Add an action to the development history."""
         entry = {
             "action": action,
             "details": details,
-            "timestamp": str(datetime.datetime.now())
+            "timestamp": datetime.datetime.now().isoformat()
         }
-        self.history.append(entry)
-        self._save_history()
+        blob = orjson.dumps(entry, default=str)
+        self._history_blobs.append(blob)
+        self._append_to_saved_history(blob)
+    
+    def _save_state_and_history(self, request: str, state_dump: Dict):
+        """Save the state reached by a request and record the request in the history."""
+        self._save_state(state_dump)
+        self._add_to_history("process_request", {
+            "request": request,
+            "final_state": state_dump
+        })
     
     async def process_request(self, request: str) -> Dict:
         """Process a user request and return the result."""
         try:
             logger.info("="*80)
-            logger.info(f"Processing new request: {request}")
+            logger.info("Processing new request: %s", request)
             logger.info("="*80)
             
             # Log initial state
             logger.info("Current state before processing:")
-            logger.info(f"- Status: {self.state.status}")
-            logger.info(f"- Step count: {self.state.step_count}")
-            logger.info(f"- Components: {len(self.state.components)}")
-            logger.info(f"- Test results: {len(self.state.test_results)}")
+            logger.info("- Status: %s", self.state.status)
+            logger.info("- Step count: %d", self.state.step_count)
+            logger.info("- Components: %d", len(self.state.components))
+            logger.info("- Test results: %d", len(self.state.test_results))
             
             # Update state with new request
             self.state.original_requirements = request
+            self.state.max_concurrency = LLM_MAX_ASYNC
+            self.state.history_store_path = str(HISTORY_DB_FILE)
             logger.info("Updated state with new requirements")
             
             # Execute the workflow
             logger.info("\nStarting workflow execution...")
             try:
-                # The workflow returns the final state
-                final_state = await self.workflow.workflow.ainvoke(self.state.model_dump())
+                # Steps are reported as they complete; the last state streamed is the final one
+                final_state = None
+                async for final_state in self.workflow.astream_steps(self.state):
+                    if final_state["step_count"]:
+                        logger.info(
+                            "Step %d: %s (status: %s)",
+                            final_state["step_count"], final_state["current_action"], final_state["status"]
+                        )
                 logger.info("Workflow execution completed successfully")
                 
                 # Convert final state back to ProjectState
                 self.state = ProjectState(**final_state)
                 logger.info("\nWorkflow execution completed")
                 logger.info("Final state summary:")
-                logger.info(f"- Status: {self.state.status}")
-                logger.info(f"- Step count: {self.state.step_count}")
-                logger.info(f"- Components: {len(self.state.components)}")
-                logger.info(f"- Test results: {len(self.state.test_results)}")
+                logger.info("- Status: %s", self.state.status)
+                logger.info("- Step count: %d", self.state.step_count)
+                logger.info("- Components: %d", len(self.state.components))
+                logger.info("- Test results: %d", len(self.state.test_results))
                 
                 # Check if we need human input
                 if self.state.status == CodeGenerationStatus.NEEDS_HUMAN_INPUT:
-                    logger.info(f"\nWorkflow needs human input:")
-                    logger.info(f"Query: {self.state.human_query}")
+                    logger.info("\nWorkflow needs human input:")
+                    logger.info("Query: %s", self.state.human_query)
                     return {
                         "status": "needs_input",
                         "query": self.state.human_query,
@@ -140,46 +245,59 @@ class RecursiveAgent:
                 if self.state.error_log:
                     logger.info("\nError log entries:")
                     for error in self.state.error_log:
-                        logger.error(f"- {error}")
+                        logger.error("- %s", error)
                 
-                # Save state and history
+                # Save state and history; the state is dumped once for both and
+                # written from a worker thread so the event loop is not blocked
                 logger.info("\nSaving state and history...")
-                self._save_state()
-                self._add_to_history("process_request", {
-                    "request": request,
-                    "final_state": self.state.model_dump()
-                })
+                state_dump = self.state.model_dump()
+                await asyncio.to_thread(self._save_state_and_history, request, state_dump)
                 logger.info("State and history saved successfully")
                 
                 return {
                     "status": "success",
-                    "state": self.state.model_dump()
+                    "state": state_dump
                 }
                 
             except Exception as graph_error:
                 logger.error("\nWorkflow execution failed:")
-                logger.error(f"Error type: {type(graph_error).__name__}")
-                logger.error(f"Error message: {str(graph_error)}")
+                logger.error("Error type: %s", type(graph_error).__name__)
+                logger.error("Error message: %s", graph_error)
                 logger.error("Stack trace:", exc_info=True)
                 raise graph_error
             
         except Exception as e:
             logger.error("\nRequest processing failed:")
-            logger.error(f"Error type: {type(e).__name__}")
-            logger.error(f"Error message: {str(e)}")
+            logger.error("Error type: %s", type(e).__name__)
+            logger.error("Error message: %s", e)
             logger.error("Stack trace:", exc_info=True)
+            state_dump = self.state.model_dump()
             error_details = {
                 "error": str(e),
                 "request": request,
-                "state": self.state.model_dump()
+                "state": state_dump
             }
-            self._add_to_history("error", error_details)
+            await asyncio.to_thread(self._add_to_history, "error", error_details)
             return {
                 "status": "error",
                 "error": str(e),
-                "state": self.state.model_dump()
+                "state": state_dump
             }
     
+    def reset(self):
+        """Start over with a fresh project state and history, keeping the LLM and workflow.
+        
+        The workflow's caches are cleared, so nothing from earlier requests is
+        replayed. The saved history is replaced once the next entry is added.
+        """
+        self.state = ProjectState(
+            status=CodeGenerationStatus.INITIAL,
+            original_requirements=""
+        )
+        self._history_blobs = []
+        self._history_file_synced = False
+        self.workflow.clear_caches()
+    
     def get_current_state(self) -> ProjectState:
         """Get the current project state."""
         return self.state
@@ -1,24 +1,41 @@
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Union
+import orjson
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage
 
 from src.state.schema import CodeComponent, CodeGenerationOutput, EnhancedActionResult
 from src.agents.tools.output_validator import OutputValidator
 from src.agents.tools.prompt_generator import StructuredPromptGenerator
+from src.workflows.llm_cache import CachedChatLLM, LLMCache
 
 class CodeGenerationAgent:
     """Agent responsible for generating high-quality code based on requirements."""
     
-    def __init__(self, llm: ChatOpenAI):
+    def __init__(self, llm: ChatOpenAI, cache: Optional[LLMCache] = None):
         """Initialize the CodeGenerationAgent.
         
         Args:
             llm: The language model to use for code generation
+            cache: Optional cache serving repeated prompts without calling the LLM
         """
-        self.llm = llm
+        self.llm = CachedChatLLM(llm, cache) if cache is not None else llm
         self.output_validator = OutputValidator()
         self.prompt_generator = StructuredPromptGenerator()
+        self.system_prompt = "You are an expert code generator.\n\n" + self.prompt_generator.generate_system_prompt(
+            "generate",
+            additional_instructions="""All generated code should be placed in the 'output' directory.
+Consider:
+- Best practices and patterns
+- Error handling and edge cases
+- Code documentation
+- Testing considerations
+
+Example file paths:
+- output/main.py
+- output/src/components/app.js
+- output/lib/utils.ts"""
+        )
     
     async def generate(self, requirement: str, context: Optional[Dict] = None) -> EnhancedActionResult:
         """Generate code based on the given requirement.
@@ -30,37 +47,51 @@ class CodeGenerationAgent:
         Returns:
             A CodeComponent containing the generated code
         """
+        generation_context = self._get_generation_context(requirement, context)
         try:
-            # Generate structured prompt
-            generation_context = {
-                "requirement": requirement,
-                "base_path": "output/"
-            }
-            if context:
-                generation_context.update(context)
-            
-            prompt = self.prompt_generator.generate_prompt(
-                "generate",
-                generation_context,
-                additional_instructions="""All generated code should be placed in the 'output' directory.
-Consider:
-- Best practices and patterns
-- Error handling and edge cases
-- Code documentation
-- Testing considerations
-
-Example file paths:
-- output/main.py
-- output/src/components/app.js
-- output/lib/utils.ts"""
-            )
+            response = await self.llm.ainvoke(self._get_generation_messages(generation_context))
+        except Exception as e:
+            response = e
+        return await self._parse_generation(response, generation_context)
+    
+    def _get_generation_context(self, requirement: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+        """Get the prompt context for a requirement."""
+        generation_context = {
+            "requirement": requirement,
+            "base_path": "output/"
+        }
+        if context:
+            generation_context.update(context)
+        return generation_context
+    
+    def _get_generation_messages(self, generation_context: Dict[str, Any]) -> List[BaseMessage]:
+        """Get the messages asking the LLM to generate code for a context.
+        
+        The static instructions form the system message and only the context
+        varies between calls, so providers can cache the instructions as a prefix.
+        """
+        return self.prompt_generator.build_messages(
+            self.llm,
+            self.system_prompt,
+            f"Requirement and context:\n{orjson.dumps(generation_context, default=str).decode()}"
+        )
+    
+    async def _parse_generation(
+        self, response: Union[BaseMessage, Exception], generation_context: Dict[str, Any]
+    ) -> EnhancedActionResult:
+        """Validate an LLM response to a generation prompt, repairing it if needed.
+        
+        Args:
+            response: The LLM response, or the exception raised by the LLM call
+            generation_context: The context the prompt was built from
             
-            # Execute through LLM
-            messages = [
-                SystemMessage(content="You are an expert code generator."),
-                HumanMessage(content=prompt)
-            ]
-            response = await self.llm.ainvoke(messages)
+        Returns:
+            The validated generation result
+        """
+        content = None
+        try:
+            if isinstance(response, Exception):
+                raise response
             
             # Validate and parse output
             content = response.content if hasattr(response, 'content') else str(response)
@@ -82,7 +113,7 @@ Example file paths:
             # Try to repair malformed output if possible
             try:
                 repaired_output = await self.output_validator.repair_malformed_output(
-                    content if 'content' in locals() else str(e),
+                    content if content is not None else str(e),
                     "generate",
                     self._get_generation_schema()
                 )
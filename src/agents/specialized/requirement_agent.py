@@ -3,6 +3,8 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import CommaSeparatedListOutputParser
 
+from src.agents.tools.prompt_generator import StructuredPromptGenerator
+
 class RequirementAnalysisAgent:
     """Agent responsible for analyzing and breaking down requirements into implementable steps."""
     
@@ -14,8 +16,9 @@ class RequirementAnalysisAgent:
         """
         self.llm = llm
         self.output_parser = CommaSeparatedListOutputParser()
+        self.prompt_generator = StructuredPromptGenerator()
         self.prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a requirements analysis expert. Break down requirements into specific, 
+            self.prompt_generator.system_message(llm, """You are a requirements analysis expert. Break down requirements into specific, 
             implementable code tasks. Focus on:
             - Concrete components to build (e.g., "Create a User class with authentication methods")
             - Specific files to create (e.g., "Implement user authentication in output/src/auth/user.js")
@@ -1,23 +1,27 @@
-from typing import Optional, Dict
+from typing import Any, Optional, Dict
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 
 from src.state.schema import CodeComponent, TestResult
+from src.agents.tools.prompt_generator import StructuredPromptGenerator
+from src.workflows.llm_cache import CachedChatLLM, LLMCache
 
 class TestingAgent:
     """Agent responsible for testing code components and providing test results."""
     
-    def __init__(self, llm: ChatOpenAI):
+    def __init__(self, llm: ChatOpenAI, cache: Optional[LLMCache] = None):
         """Initialize the TestingAgent.
         
         Args:
             llm: The language model to use for test generation and analysis
+            cache: Optional cache serving repeated prompts without calling the LLM
         """
-        self.llm = llm
+        self.llm = CachedChatLLM(llm, cache) if cache is not None else llm
         self.output_parser = JsonOutputParser()
+        self.prompt_generator = StructuredPromptGenerator()
         self.test_generation_prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are an expert test engineer. Generate comprehensive tests for code components.
+            self.prompt_generator.system_message(llm, """You are an expert test engineer. Generate comprehensive tests for code components.
             Consider:
             - Edge cases and error conditions
             - Input validation
@@ -35,6 +39,25 @@ class TestingAgent:
             Code:
             {code}""")
         ])
+        self.analysis_prompt = ChatPromptTemplate.from_messages([
+            self.prompt_generator.system_message(llm, """You are a code quality expert. Analyze the code for:
+            - Potential bugs or errors
+            - Code quality issues
+            - Performance concerns
+            - Security vulnerabilities
+            - Best practice violations
+            
+            Format your response as a JSON object with:
+            {
+                "passed": boolean,
+                "issues": ["list", "of", "issues"],
+                "suggestions": ["list", "of", "improvement", "suggestions"]
+            }"""),
+            ("human", """Analyze this {language} code:
+            {code}
+            
+            Consider the test cases: {test_cases}""")
+        ])
     
     async def test_component(self, component: CodeComponent, context: Optional[Dict] = None) -> TestResult:
         """Test a code component and return results.
@@ -90,28 +113,26 @@ class TestingAgent:
         """
         try:
             # Analyze code quality and potential issues
-            analysis_prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are a code quality expert. Analyze the code for:
-                - Potential bugs or errors
-                - Code quality issues
-                - Performance concerns
-                - Security vulnerabilities
-                - Best practice violations
-                
-                Format your response as a JSON object with:
-                {
-                    "passed": boolean,
-                    "issues": ["list", "of", "issues"],
-                    "suggestions": ["list", "of", "improvement", "suggestions"]
-                }"""),
-                ("human", f"""Analyze this {component.language} code:
-                {component.content}
-                
-                Consider the test cases: {test_plan['test_cases']}""")
-            ])
+            chain = self.analysis_prompt | self.llm | self.output_parser
+            analysis = await chain.ainvoke(self._get_analysis_input(component, test_plan))
+            return self._create_test_result(component, analysis)
             
-            chain = analysis_prompt | self.llm | self.output_parser
-            analysis = await chain.ainvoke({})
+        except Exception as e:
+            return self._create_test_result(component, e)
+    
+    def _get_analysis_input(self, component: CodeComponent, test_plan: Dict) -> Dict[str, Any]:
+        """Get the analysis prompt variables for a component and its test plan."""
+        return {
+            "language": component.language,
+            "code": component.content,
+            "test_cases": test_plan['test_cases']
+        }
+    
+    def _create_test_result(self, component: CodeComponent, analysis: Any) -> TestResult:
+        """Create the TestResult of a component from its analysis, or the exception raised instead."""
+        try:
+            if isinstance(analysis, Exception):
+                raise analysis
             
             # Create detailed test result
             return TestResult(
@@ -1,6 +1,6 @@
 """Tools for code generation and manipulation."""
 from typing import Dict, List, Optional
-import json
+import orjson
 from pathlib import Path
 
 from langchain.tools import Tool, StructuredTool
@@ -9,39 +9,53 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.output_parsers import JsonOutputParser
+from .prompt_generator import StructuredPromptGenerator
+
+_GENERATION_SYSTEM_PROMPT = """You are an expert code generator. Generate code based on the provided specification.
+Follow these guidelines:
+- Use modern best practices and patterns
+- Include necessary imports
+- Add comprehensive docstrings and comments
+- Consider error handling and edge cases
+- Return the code and suggested file path in a JSON structure"""
+
+_ANALYSIS_SYSTEM_PROMPT = """You are an expert code analyzer. Analyze the provided code and suggest improvements.
+Consider:
+- Code structure and organization
+- Performance optimizations
+- Security considerations
+- Best practices adherence
+- Potential bugs or issues
+Return analysis in a JSON structure."""
 
 class CodeTools:
     """Collection of tools for code generation and analysis."""
     
     def __init__(self, llm: ChatOpenAI):
-        """Initialize code tools with a language model."""
+        """Initialize code tools with a language model.
+        
+        The instructions are static, so they are built once as the leading
+        system message and the per-call input follows in its own message.
+        """
         self.llm = llm
         self.parser = JsonOutputParser()
+        self.prompt_generator = StructuredPromptGenerator()
+        self.generation_chain = ChatPromptTemplate.from_messages([
+            self.prompt_generator.system_message(llm, _GENERATION_SYSTEM_PROMPT),
+            ("human", "Type: {type}\nRequirements:\n{requirements}\nContext: {context}")
+        ]) | self.llm | self.parser
+        self.analysis_chain = ChatPromptTemplate.from_messages([
+            self.prompt_generator.system_message(llm, _ANALYSIS_SYSTEM_PROMPT),
+            ("human", "Code to analyze: {code}\nAdditional context: {context}")
+        ]) | self.llm | self.parser
     
     def generate_code(self, input: CodeGenerationSpec) -> Dict:
         """Generate code based on a specification."""
-        prompt = PromptTemplate.from_template(
-            """You are an expert code generator. Generate code based on the provided specification.
-Follow these guidelines:
-- Use modern best practices and patterns
-- Include necessary imports
-- Add comprehensive docstrings and comments
-- Consider error handling and edge cases
-- Return the code and suggested file path in a JSON structure
-
-Type: {type}
-Requirements:
-{requirements}
-Context: {context}"""
-        )
-        
-        chain = prompt | self.llm | self.parser
-        
         try:
-            result = chain.invoke({
+            result = self.generation_chain.invoke({
                 "type": input.type,
                 "requirements": "\n".join(f"- {req}" for req in input.requirements),
-                "context": json.dumps(input.context) if input.context else "{}"
+                "context": orjson.dumps(input.context, default=str).decode() if input.context else "{}"
             })
             return {
                 "status": "success",
@@ -57,26 +71,10 @@ Context: {context}"""
     
     def analyze_code(self, input: CodeAnalysisInput) -> Dict:
         """Analyze code and suggest improvements."""
-        prompt = PromptTemplate.from_template(
-            """You are an expert code analyzer. Analyze the provided code and suggest improvements.
-Consider:
-- Code structure and organization
-- Performance optimizations
-- Security considerations
-- Best practices adherence
-- Potential bugs or issues
-Return analysis in a JSON structure.
-
-Code to analyze: {code}
-Additional context: {context}"""
-        )
-        
-        chain = prompt | self.llm | self.parser
-        
         try:
-            result = chain.invoke({
+            result = self.analysis_chain.invoke({
                 "code": input.code,
-                "context": json.dumps(input.context) if input.context else "{}"
+                "context": orjson.dumps(input.context, default=str).decode() if input.context else "{}"
             })
             return {
                 "status": "success",
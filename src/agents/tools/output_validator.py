@@ -1,5 +1,7 @@
+import asyncio
 import json
 import uuid
+import orjson
 import logging
 from typing import Type, Dict, Any, Optional, Union
 from pydantic import ValidationError
@@ -11,23 +13,26 @@ from src.state.schema import (
     TestExecutionOutput,
     EnhancedActionResult
 )
+from src.workflows.incremental_json import IncrementalJsonParser, loads_json
 
-# Set up logging
+# Set up logging; the handler is attached on first use rather than at import
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-# Remove existing handlers
-for handler in logger.handlers[:]:
-    logger.removeHandler(handler)
-
-# Create console handler with custom formatter
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
-logger.addHandler(console_handler)
+def _configure_logging() -> None:
+    """Attach the console handler once, however often the module is used."""
+    if logger.handlers:
+        return
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+    logger.addHandler(console_handler)
 
 class OutputValidator:
     """Validates and processes AI outputs to ensure consistent structure."""
 
+    def __init__(self):
+        _configure_logging()
+
     @staticmethod
     def _generate_step_id() -> str:
         """Generate a unique step ID."""
@@ -35,18 +40,29 @@ class OutputValidator:
 
     @staticmethod
     def _extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
-        """Extract JSON from potentially noisy text output."""
+        """Extract JSON from potentially noisy text output.
+
+        Text around the JSON is skipped by a single scan for the first complete
+        top-level object, which is then decoded on its own, so prose or a second
+        object after it does not make decoding fail.
+        """
         try:
             # First try direct JSON parsing
-            return json.loads(text)
+            return loads_json(text)
         except json.JSONDecodeError:
-            # Try to find JSON-like structure in the text
+            parser = IncrementalJsonParser()
+            if parser.feed(text):
+                try:
+                    return parser.result()
+                except ValueError:
+                    pass
+            # Fall back to the span between the outermost braces
             try:
                 start_idx = text.find("{")
                 end_idx = text.rfind("}")
                 if start_idx != -1 and end_idx != -1:
                     json_str = text[start_idx:end_idx + 1]
-                    return json.loads(json_str)
+                    return loads_json(json_str)
             except (json.JSONDecodeError, ValueError):
                 return None
 
@@ -86,19 +102,25 @@ class OutputValidator:
         self, 
         raw_output: str, 
         action_type: str,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        parsed: Optional[Dict[str, Any]] = None
     ) -> EnhancedActionResult:
-        """Validate and parse raw LLM output into structured format."""
+        """Validate and parse raw LLM output into structured format.
+
+        If the caller already decoded the output, it can pass the result as
+        `parsed` to skip extracting JSON from the raw text again.
+        """
         try:
-            logger.info(f"Starting validation for {action_type} output")
-            logger.info(f"Raw output length: {len(raw_output)}")
+            logger.info("Starting validation for %s output", action_type)
+            logger.info("Raw output length: %d", len(raw_output))
             
-            # Extract JSON from potentially noisy output
-            data = self._extract_json_from_text(raw_output)
+            # Extract JSON from potentially noisy output, unless already decoded;
+            # the decoded object may be shared, so it is copied before mutating
+            data = dict(parsed) if parsed is not None else self._extract_json_from_text(raw_output)
             if not data:
                 logger.error("Failed to extract JSON from output")
                 raise ValueError("Failed to extract JSON from output")
-            logger.info(f"Successfully extracted JSON data with keys: {list(data.keys())}")
+            logger.info("Successfully extracted JSON data with keys: %s", list(data))
 
             # Add base fields
             logger.info("Adding base fields to data")
@@ -106,11 +128,11 @@ class OutputValidator:
 
             # Add context to metadata if provided
             if context:
-                logger.info(f"Adding context to metadata: {context}")
-                data["metadata"]["context"] = context
+                logger.info("Adding context to metadata: %s", context)
+                data["metadata"] = {**data["metadata"], "context": context}
 
             # Create appropriate output type based on action
-            logger.info(f"Creating output type for action: {action_type}")
+            logger.info("Creating output type for action: %s", action_type)
             if action_type == "analyze":
                 logger.info("Processing analysis output")
                 # Ensure all list fields contain strings
@@ -127,7 +149,7 @@ class OutputValidator:
                         "documentation": 0.0
                     }),
                     priority_actions=priority_actions,
-                    **{k: v for k, v in data.items() if k in AIStepOutput.__fields__}
+                    **{k: v for k, v in data.items() if k in AIStepOutput.model_fields}
                 )
             elif action_type == "generate":
                 output = CodeGenerationOutput(
@@ -138,7 +160,7 @@ class OutputValidator:
                     quality_checks=data.get("quality_checks", {}),
                     generation_context=data.get("generation_context", {}),
                     validation_results=data.get("validation_results", []),
-                    **{k: v for k, v in data.items() if k in AIStepOutput.__fields__}
+                    **{k: v for k, v in data.items() if k in AIStepOutput.model_fields}
                 )
             elif action_type == "test":
                 output = TestExecutionOutput(
@@ -146,7 +168,7 @@ class OutputValidator:
                     coverage=data.get("coverage", {}),
                     performance_metrics=data.get("performance_metrics"),
                     failures=data.get("failures", []),
-                    **{k: v for k, v in data.items() if k in AIStepOutput.__fields__}
+                    **{k: v for k, v in data.items() if k in AIStepOutput.model_fields}
                 )
             else:
                 raise ValueError(f"Unknown action type: {action_type}")
@@ -161,7 +183,7 @@ class OutputValidator:
                     "validation_successful": True,
                     "validation_details": {
                         "output_type": output.__class__.__name__,
-                        "fields_present": list(output.dict().keys())
+                        "fields_present": list(type(output).model_fields)
                     }
                 }
             )
@@ -169,7 +191,7 @@ class OutputValidator:
             return result
 
         except (ValidationError, ValueError, KeyError) as e:
-            logger.error(f"Validation error: {str(e)}")
+            logger.error("Validation error: %s", e)
             # Return error result with partial data if possible
             error_context = {
                 "error_type": type(e).__name__,
@@ -178,7 +200,11 @@ class OutputValidator:
                 "raw_output": raw_output[:500] + "..." if len(raw_output) > 500 else raw_output,
                 "validation_stage": "data_extraction" if "data" not in locals() else "model_validation"
             }
-            logger.error(f"Error context: {json.dumps(error_context, indent=2)}")
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error(
+                    "Error context: %s",
+                    orjson.dumps(error_context, option=orjson.OPT_INDENT_2, default=str).decode()
+                )
             
             # Try to create a basic output structure even in error case
             try:
@@ -206,10 +232,24 @@ class OutputValidator:
         raw_output: str, 
         action_type: str,
         expected_schema: Type[AIStepOutput]
+    ) -> str:
+        """Attempt to repair malformed LLM output without blocking the event loop."""
+        return await asyncio.to_thread(
+            self.repair_malformed_output_sync,
+            raw_output,
+            action_type,
+            expected_schema
+        )
+
+    def repair_malformed_output_sync(
+        self, 
+        raw_output: str, 
+        action_type: str,
+        expected_schema: Type[AIStepOutput]
     ) -> str:
         """Attempt to repair malformed LLM output."""
         try:
-            logger.info(f"Attempting to repair malformed {action_type} output")
+            logger.info("Attempting to repair malformed %s output", action_type)
             # Extract any JSON-like structure
             data = self._extract_json_from_text(raw_output)
             logger.info("Extracted data from malformed output")
@@ -245,7 +285,7 @@ class OutputValidator:
                 })
 
             # Return repaired JSON string
-            return json.dumps(data)
+            return orjson.dumps(data, default=str).decode()
 
         except Exception as e:
             # If repair fails, return minimal valid JSON structure
@@ -258,4 +298,4 @@ class OutputValidator:
                     "original_output": raw_output
                 }
             }
-            return json.dumps(minimal_data)
+            return orjson.dumps(minimal_data, default=str).decode()
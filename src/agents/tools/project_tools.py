@@ -1,6 +1,6 @@
 """Tools for project analysis and management."""
 from typing import Dict, List, Optional
-import json
+import orjson
 from pathlib import Path
 import ast
 import re
@@ -8,8 +8,23 @@ import re
 from langchain.tools import Tool, StructuredTool
 from .schemas import ProjectAnalysisInput, ImprovementSuggestionInput
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+from .prompt_generator import StructuredPromptGenerator
+
+_SUGGESTION_SYSTEM_PROMPT = """You are an expert project architect. Analyze the project structure and suggest improvements.
+Consider:
+- Code organization and modularity
+- Missing essential files (README, tests, etc.)
+- Development workflow improvements
+- Best practices for the detected languages
+Return suggestions in a JSON structure with clear, actionable items."""
+
+# Import statements of JavaScript/TypeScript files, compiled once
+_JS_IMPORT_PATTERNS = (
+    re.compile(r'import.*?from [\'"](@?[^\'".]+)[\'"]'),  # ES6 imports
+    re.compile(r'require\([\'"](@?[^\'".]+)[\'"]\)'),     # CommonJS requires
+)
 
 class ProjectTools:
     """Collection of tools for project analysis and management."""
@@ -19,6 +34,12 @@ class ProjectTools:
         self.llm = llm
         self.project_root = project_root
         self.parser = JsonOutputParser()
+        self.prompt_generator = StructuredPromptGenerator()
+        # The instructions are static, so they lead as a system message built once
+        self.suggestion_chain = ChatPromptTemplate.from_messages([
+            self.prompt_generator.system_message(llm, _SUGGESTION_SYSTEM_PROMPT),
+            ("human", "Project structure to analyze: {analysis}")
+        ]) | self.llm | self.parser
     
     def analyze_project_structure(self, input: ProjectAnalysisInput) -> Dict:
         """Analyze the structure of a project directory."""
@@ -89,14 +110,8 @@ class ProjectTools:
         """Analyze JavaScript/TypeScript file imports."""
         try:
             content = file_path.read_text()
-            # Match import statements
-            import_patterns = [
-                r'import.*?from [\'"](@?[^\'".]+)[\'"]',  # ES6 imports
-                r'require\([\'"](@?[^\'".]+)[\'"]\)',     # CommonJS requires
-            ]
-            
-            for pattern in import_patterns:
-                for match in re.finditer(pattern, content):
+            for pattern in _JS_IMPORT_PATTERNS:
+                for match in pattern.finditer(content):
                     package = match.group(1)
                     if not package.startswith('.'):
                         dependencies.add(package)
@@ -105,22 +120,8 @@ class ProjectTools:
     
     def suggest_improvements(self, input: ImprovementSuggestionInput) -> Dict:
         """Suggest project improvements based on analysis."""
-        prompt = PromptTemplate.from_template(
-            """You are an expert project architect. Analyze the project structure and suggest improvements.
-Consider:
-- Code organization and modularity
-- Missing essential files (README, tests, etc.)
-- Development workflow improvements
-- Best practices for the detected languages
-Return suggestions in a JSON structure with clear, actionable items.
-
-Project structure to analyze: {analysis}"""
-        )
-        
-        chain = prompt | self.llm | self.parser
-        
         try:
-            result = chain.invoke({"analysis": json.dumps(input.analysis)})
+            result = self.suggestion_chain.invoke({"analysis": orjson.dumps(input.analysis, default=str).decode()})
             return {
                 "status": "success",
                 "suggestions": result
@@ -1,11 +1,9 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
-class StructuredPromptGenerator:
-    """Generates structured prompts with explicit output format instructions."""
-
-    def _get_base_format_instructions(self) -> str:
-        """Get base format instructions for all prompts."""
-        return """
+# Prompt templates are static, so they are built once at import time
+_BASE_FORMAT_INSTRUCTIONS = """
 You must respond with ONLY a JSON object, no additional text or explanation.
 Your response must include these base fields:
 {
@@ -18,12 +16,7 @@ Your response must include these base fields:
     }
 }"""
 
-    def _get_analysis_prompt(self, context: Dict[str, Any]) -> str:
-        """Generate prompt for code analysis."""
-        return f"""Analyze the following code context and provide structured insights:
-{context}
-
-{self._get_base_format_instructions()}
+_ANALYSIS_INSTRUCTIONS = f"""{_BASE_FORMAT_INSTRUCTIONS}
 
 Your JSON response must also include:
 {{
@@ -37,12 +30,7 @@ Your JSON response must also include:
     "priority_actions": ["ordered list of actions to take"]
 }}"""
 
-    def _get_generation_prompt(self, context: Dict[str, Any]) -> str:
-        """Generate prompt for code generation."""
-        return f"""Generate code based on the following requirements and context:
-{context}
-
-{self._get_base_format_instructions()}
+_GENERATION_INSTRUCTIONS = f"""{_BASE_FORMAT_INSTRUCTIONS}
 
 Your JSON response must also include:
 {{
@@ -68,12 +56,7 @@ Your JSON response must also include:
     ]
 }}"""
 
-    def _get_testing_prompt(self, context: Dict[str, Any]) -> str:
-        """Generate prompt for test execution."""
-        return f"""Execute tests on the following code:
-{context}
-
-{self._get_base_format_instructions()}
+_TESTING_INSTRUCTIONS = f"""{_BASE_FORMAT_INSTRUCTIONS}
 
 Your JSON response must also include:
 {{
@@ -103,12 +86,7 @@ Your JSON response must also include:
     ]
 }}"""
 
-    def _get_error_handling_prompt(self, context: Dict[str, Any]) -> str:
-        """Generate prompt for error handling scenarios."""
-        return f"""Handle the following error scenario:
-{context}
-
-{self._get_base_format_instructions()}
+_ERROR_HANDLING_INSTRUCTIONS = f"""{_BASE_FORMAT_INSTRUCTIONS}
 
 Your JSON response must also include:
 {{
@@ -121,36 +99,126 @@ Your JSON response must also include:
     "prevention_suggestions": ["list of ways to prevent this error"]
 }}"""
 
+# Per action type: (header of a prompt with inline context, header of a system
+# prompt whose context follows in the next message, output instructions)
+_PROMPT_TEMPLATES = {
+    "analyze": (
+        "Analyze the following code context and provide structured insights:",
+        "Analyze the code context in the next message and provide structured insights.",
+        _ANALYSIS_INSTRUCTIONS
+    ),
+    "generate": (
+        "Generate code based on the following requirements and context:",
+        "Generate code based on the requirements and context in the next message.",
+        _GENERATION_INSTRUCTIONS
+    ),
+    "test": (
+        "Execute tests on the following code:",
+        "Execute tests on the code in the next message.",
+        _TESTING_INSTRUCTIONS
+    ),
+    "handle_error": (
+        "Handle the following error scenario:",
+        "Handle the error scenario in the next message.",
+        _ERROR_HANDLING_INSTRUCTIONS
+    )
+}
+
+class StructuredPromptGenerator:
+    """Generates structured prompts with explicit output format instructions."""
+
+    def _get_analysis_prompt(self, context: Dict[str, Any]) -> str:
+        """Generate prompt for code analysis."""
+        return self._render_prompt("analyze", context)
+
+    def _get_generation_prompt(self, context: Dict[str, Any]) -> str:
+        """Generate prompt for code generation."""
+        return self._render_prompt("generate", context)
+
+    def _get_testing_prompt(self, context: Dict[str, Any]) -> str:
+        """Generate prompt for test execution."""
+        return self._render_prompt("test", context)
+
+    def _get_error_handling_prompt(self, context: Dict[str, Any]) -> str:
+        """Generate prompt for error handling scenarios."""
+        return self._render_prompt("handle_error", context)
+
+    def _render_prompt(self, action_type: str, context: Dict[str, Any]) -> str:
+        """Render the prompt of an action type with the context inline."""
+        header, _, instructions = _PROMPT_TEMPLATES[action_type]
+        return f"{header}\n{context}\n\n{instructions}"
+
     def generate_prompt(
-        self, 
-        action_type: str, 
+        self,
+        action_type: str,
         context: Dict[str, Any],
         additional_instructions: Optional[str] = None
     ) -> str:
         """Generate a structured prompt based on action type and context."""
-        prompt_generators = {
-            "analyze": self._get_analysis_prompt,
-            "generate": self._get_generation_prompt,
-            "test": self._get_testing_prompt,
-            "handle_error": self._get_error_handling_prompt
-        }
-
-        if action_type not in prompt_generators:
+        if action_type not in _PROMPT_TEMPLATES:
+            raise ValueError(f"Unknown action type: {action_type}")
+
+        prompt = self._render_prompt(action_type, context)
+
+        if additional_instructions:
+            prompt += f"\n\nAdditional Instructions:\n{additional_instructions}"
+
+        return prompt
+
+    def generate_system_prompt(
+        self,
+        action_type: str,
+        additional_instructions: Optional[str] = None
+    ) -> str:
+        """Generate the static part of a prompt, leaving the context to a later message.
+
+        The result depends only on the action type and instructions, so it is
+        byte-identical across calls and can be served from provider prompt caches.
+        """
+        if action_type not in _PROMPT_TEMPLATES:
             raise ValueError(f"Unknown action type: {action_type}")
 
-        prompt = prompt_generators[action_type](context)
-        
+        _, header, instructions = _PROMPT_TEMPLATES[action_type]
+        prompt = f"{header}\n{instructions}"
+
         if additional_instructions:
             prompt += f"\n\nAdditional Instructions:\n{additional_instructions}"
 
         return prompt
 
+    def build_messages(
+        self,
+        llm: BaseChatModel,
+        system_prompt: str,
+        user_content: str
+    ) -> List[BaseMessage]:
+        """Build a system/user message pair with the static system prompt first.
+
+        OpenAI caches identical prompt prefixes automatically, while Anthropic only
+        caches blocks explicitly marked with cache_control.
+        """
+        return [self.system_message(llm, system_prompt), HumanMessage(content=user_content)]
+
+    def system_message(self, llm: BaseChatModel, system_prompt: str) -> SystemMessage:
+        """Build a static system message, marked as cacheable for providers that need it.
+
+        The message is used verbatim, so it can also start a ChatPromptTemplate
+        without its braces being parsed as template variables.
+        """
+        if getattr(llm, "_llm_type", None) == "anthropic-chat":
+            return SystemMessage(content=[{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"}
+            }])
+        return SystemMessage(content=system_prompt)
+
     def get_repair_prompt(self, malformed_output: str, expected_schema: Dict[str, Any]) -> str:
         """Generate a prompt to repair malformed output."""
         return f"""The following output was malformed:
 {malformed_output}
 
-{self._get_base_format_instructions()}
+{_BASE_FORMAT_INSTRUCTIONS}
 
 The output should follow this schema:
 {expected_schema}
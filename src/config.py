@@ -16,6 +16,10 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4-turbo-preview")
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", "4000"))
+LLM_MAX_ASYNC = int(os.getenv("LLM_MAX_ASYNC", "10"))  # Parallel LLM calls per step
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))  # Retries with backoff, e.g. on 429s
+PROMPT_CACHE_KEY = os.getenv("PROMPT_CACHE_KEY")  # Routes requests to the same OpenAI prompt cache
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "0"))  # Seconds LLM responses are reused; 0 disables the cache
 
 # Git configuration
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
@@ -26,11 +30,15 @@ DEFAULT_AGENT_CONFIG = {
     "temperature": TEMPERATURE,
     "max_tokens": MAX_TOKENS,
     "api_key": OPENAI_API_KEY,
+    "max_retries": LLM_MAX_RETRIES,
 }
+if PROMPT_CACHE_KEY:
+    DEFAULT_AGENT_CONFIG["model_kwargs"] = {"prompt_cache_key": PROMPT_CACHE_KEY}
 
 # Project state tracking
 STATE_FILE = MEMLOG_DIR / "project_state.json"
 HISTORY_FILE = MEMLOG_DIR / "development_history.json"
+HISTORY_DB_FILE = MEMLOG_DIR / "development_history.db"
 
 def validate_config():
     """Validate the configuration and ensure required directories exist."""
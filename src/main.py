@@ -87,6 +87,18 @@ def setup_logging():
 # Set up logging and get logger
 logger = setup_logging()
 
+def completed_at(entry: Dict[str, Any]) -> Optional[datetime.datetime]:
+    """Get when a development history entry was completed, if it was recorded.
+    
+    Entries saved before timestamps were taken in nanoseconds carry the
+    formatted time under "timestamp" instead.
+    """
+    if entry.get("timestamp_ns") is not None:
+        return datetime.datetime.fromtimestamp(entry["timestamp_ns"] / 1e9)
+    if entry.get("timestamp"):
+        return datetime.datetime.fromisoformat(entry["timestamp"])
+    return None
+
 class RecursiveAgentApp:
     """Application wrapper for the recursive development agent."""
     
@@ -228,7 +240,7 @@ async def main():
                         latest_entry = state["development_history"][-1]
                         history_info = [
                             "\nDevelopment History:",
-                            f"Step {latest_entry['step']} completed at {latest_entry['timestamp']}"
+                            f"Step {latest_entry['step']} completed at {completed_at(latest_entry) or 'an unknown time'}"
                         ]
                         if latest_entry.get("action"):
                             history_info.append(f"Action: {latest_entry['action']}")
@@ -1,6 +1,23 @@
+from collections import deque
 from enum import Enum
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any, Union
+from functools import cached_property
+import hashlib
+from pydantic import (
+    BaseModel, Field, ValidationInfo, ValidatorFunctionWrapHandler,
+    field_serializer, field_validator, model_validator
+)
+from typing import List, Dict, Optional, Any, Union, Deque, Iterable, Set
+
+# Only the latest history entries are read, so histories are bounded
+MAX_HISTORY_LENGTH = 1000
+MAX_ACTION_HISTORY_LENGTH = 64
+MAX_ERROR_LOG_LENGTH = 256
+MAX_TEST_RESULTS_PER_COMPONENT = 16
+_HISTORY_LENGTHS = {
+    "action_history": MAX_ACTION_HISTORY_LENGTH,
+    "error_log": MAX_ERROR_LOG_LENGTH,
+    "development_history": MAX_HISTORY_LENGTH
+}
 
 class CodeGenerationStatus(str, Enum):
     INITIAL = "initial"
@@ -92,6 +109,11 @@ class CodeComponent(BaseModel):
     status: str = "pending"
     version: int = 1
 
+    @cached_property
+    def content_hash(self) -> str:
+        """Hash of the component's content, used to detect unchanged code."""
+        return hashlib.sha256(self.content.encode()).hexdigest()
+
     def model_dump(self, **kwargs):
         """Override model_dump to ensure proper serialization"""
         return {
@@ -110,6 +132,21 @@ class TestResult(BaseModel):
     error_message: Optional[str] = None
     execution_time: float
     suggestions: List[str] = Field(default_factory=list)
+    tested_hash: Optional[str] = None  # content_hash of the component that was tested
+
+    @cached_property
+    def prompt_context(self) -> Dict[str, Any]:
+        """The result as shown in prompts, built once since results are never modified."""
+        return self.model_dump(exclude={"tested_hash"})
+
+    @property
+    def needs_refinement(self) -> bool:
+        """Whether the component failed its test or has suggestions left to apply."""
+        return not self.passed or bool(self.suggestions)
+
+def bounded_test_results(results: Iterable[TestResult] = ()) -> Deque[TestResult]:
+    """Create the bounded history of a component's test results."""
+    return deque(results, maxlen=MAX_TEST_RESULTS_PER_COMPONENT)
 
 class ProjectState(BaseModel):
     # Core tracking
@@ -121,11 +158,17 @@ class ProjectState(BaseModel):
     
     # Code management
     components: Dict[str, CodeComponent] = Field(default_factory=dict)
-    test_results: Dict[str, List[TestResult]] = Field(default_factory=dict)
+    test_results: Dict[str, Deque[TestResult]] = Field(default_factory=dict)  # Latest results per component
+    # Latest test result of each component, derived from test_results and kept in sync on append
+    latest_test_results: Dict[str, TestResult] = Field(default_factory=dict, exclude=True)
+    # Components whose latest test result needs refinement, kept in sync with latest_test_results
+    failing_paths: Set[str] = Field(default_factory=set, exclude=True)
     
     # AI decision tracking
     current_action: Optional[ActionDecision] = None
-    action_history: List[ActionDecision] = Field(default_factory=list)
+    action_history: Deque[ActionDecision] = Field(
+        default_factory=lambda: deque(maxlen=MAX_ACTION_HISTORY_LENGTH)
+    )
     
     # Human interaction
     needs_human_input: bool = False
@@ -135,7 +178,63 @@ class ProjectState(BaseModel):
     # Progress tracking
     step_count: int = Field(default=0)
     max_steps: int = Field(default=50)  # Safety limit
+    max_concurrency: int = Field(default=8)  # Limit on parallel LLM calls per step
     
     # Memory and history
-    error_log: List[str] = Field(default_factory=list)
-    development_history: List[Dict] = Field(default_factory=list)
+    error_log: Deque[str] = Field(default_factory=lambda: deque(maxlen=MAX_ERROR_LOG_LENGTH))
+    development_history: Deque[Dict] = Field(
+        default_factory=lambda: deque(maxlen=MAX_HISTORY_LENGTH)
+    )
+    history_store_path: Optional[str] = None  # SQLite log of the full development history
+
+    @field_validator("action_history", "error_log", "development_history", mode="wrap")
+    @classmethod
+    def _bound_history(cls, value: Any, handler: ValidatorFunctionWrapHandler, info: ValidationInfo) -> Deque:
+        """Keep histories bounded so appending never grows them past the limit.
+
+        A history that is already bounded is kept as is, so passing the state
+        on between workflow steps does not copy its histories.
+        """
+        max_length = _HISTORY_LENGTHS[info.field_name]
+        if isinstance(value, deque) and value.maxlen == max_length:
+            return value
+        return deque(handler(value), maxlen=max_length)
+
+    @field_validator("test_results", mode="wrap")
+    @classmethod
+    def _bound_test_results(cls, value: Any, handler: ValidatorFunctionWrapHandler) -> Dict[str, Deque[TestResult]]:
+        """Keep only the latest test results of each component.
+
+        Test results whose histories are all bounded already are kept as is,
+        like the other histories, so they are not copied on every step.
+        """
+        if isinstance(value, dict) and all(
+            isinstance(results, deque) and results.maxlen == MAX_TEST_RESULTS_PER_COMPONENT
+            for results in value.values()
+        ):
+            return value
+        return {
+            path: bounded_test_results(results)
+            for path, results in handler(value).items()
+        }
+
+    @model_validator(mode="after")
+    def _index_latest_test_results(self) -> "ProjectState":
+        """Index the latest test result of each component and the ones needing refinement."""
+        self.latest_test_results = {
+            path: results[-1] for path, results in self.test_results.items() if results
+        }
+        self.failing_paths = {
+            path for path, result in self.latest_test_results.items() if result.needs_refinement
+        }
+        return self
+
+    @field_serializer("test_results")
+    def _serialize_test_results(self, value: Dict[str, Deque[TestResult]]) -> Dict[str, List[TestResult]]:
+        """Serialize test result histories as plain lists."""
+        return {path: list(results) for path, results in value.items()}
+
+    @field_serializer("action_history", "error_log", "development_history")
+    def _serialize_history(self, value: Deque) -> List:
+        """Serialize histories as plain lists."""
+        return list(value)
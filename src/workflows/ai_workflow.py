@@ -1,8 +1,22 @@
-from typing import Dict, Any, Optional, List
-import json
+from typing import (
+    Dict, Any, Optional, List, Union, Tuple, Mapping, Iterable, Callable, Awaitable, AsyncIterator, ClassVar
+)
+from collections import OrderedDict, deque
+from contextlib import aclosing, asynccontextmanager
+from functools import singledispatch
+from itertools import islice
+from types import MappingProxyType
+import asyncio
+import copy
+import hashlib
 import logging
+import re
+import time
+import orjson
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig
 from langgraph.graph import StateGraph, END, START
 from pydantic import BaseModel
 
@@ -13,36 +27,312 @@ from src.state.schema import (
     CodeComponent, 
     TestResult,
     EnhancedActionResult,
-    CodeAnalysisOutput
+    CodeAnalysisOutput,
+    bounded_test_results
 )
 from src.agents.tools.output_validator import OutputValidator
 from src.agents.tools.prompt_generator import StructuredPromptGenerator
+from src.workflows.batch import BatchProcessor
+from src.workflows.decision_cache import DecisionTemplateCache
+from src.workflows.history_store import HistoryStore
+from src.workflows.incremental_json import IncrementalJsonParser
+from src.workflows.llm_cache import CachedChatLLM, LLMCache, message_text, messages_key
 
-# Set up logging
+# Set up logging; the handler is attached on first use rather than at import
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-# Remove existing handlers
-for handler in logger.handlers[:]:
-    logger.removeHandler(handler)
+def _configure_logging() -> None:
+    """Attach the console handler once, however often the module is used."""
+    if logger.handlers:
+        return
+    logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+    logger.addHandler(console_handler)
+
+# Action types whose per-file work is independent and can run concurrently
+_PARALLEL_ACTION_TYPES = ("generate", "test")
+
+# Number of validated outputs memoized per supervisor
+_VALIDATION_CACHE_SIZE = 1024
+
+# Action types with a static prompt prefix rendered up front
+_PROMPT_ACTION_TYPES = ("analyze", "generate", "test")
+
+# Expected output schemas used when repairing malformed action output
+_EXPECTED_SCHEMAS = MappingProxyType({
+    "analyze": {
+        "insights": ["string"],
+        "recommendations": ["string"],
+        "code_quality_metrics": {
+            "complexity": "float",
+            "maintainability": "float",
+            "documentation": "float"
+        },
+        "priority_actions": ["string"]
+    },
+    "generate": {
+        "file_path": "string",
+        "content": "string",
+        "language": "string",
+        "dependencies": ["string"],
+        "quality_checks": {
+            "syntax_valid": "boolean",
+            "follows_style_guide": "boolean",
+            "has_documentation": "boolean"
+        }
+    },
+    "test": {
+        "test_cases": [{
+            "name": "string",
+            "status": "string",
+            "error_message": "string (optional)"
+        }],
+        "coverage": {
+            "line_coverage": "float",
+            "branch_coverage": "float"
+        }
+    }
+})
+_EMPTY_SCHEMA = MappingProxyType({})
+
+_DECISION_ROLE = "You are an AI project manager overseeing a code generation project."
+
+# Words marking a priority action as code generation, matched anywhere in one scan
+_GENERATE_KEYWORDS = re.compile("implement|create|build|generate", re.IGNORECASE)
+
+_DECISION_INSTRUCTIONS = """
+Consider:
+1. Project requirements and current progress
+2. Code quality and test results
+3. Recent actions and their outcomes
+4. Whether human input might be needed
+
+Your response must include:
+1. Insights about the current state
+2. Recommendations for next steps
+3. Code quality metrics if applicable
+4. Priority actions to take
+
+Also include a "decision" object in the metadata with this structure:
+{
+    "action_type": "string (e.g., 'analyze', 'generate', 'test', 'refactor', 'ask_human', 'complete')",
+    "description": "string explaining the action",
+    "needs_human_input": boolean,
+    "human_query": "string (if needs_human_input is true)",
+    "context": {
+        "relevant_files": ["list of files to focus on"],
+        "specific_focus": "string describing specific aspect to address",
+        "expected_outcome": "string describing what this action should achieve"
+    }
+}"""
 
-# Create console handler with custom formatter
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
-logger.addHandler(console_handler)
+# Static prompt prefixes are rendered once per process so every call, from
+# every supervisor, sends identical bytes
+_DECISION_PREFIX = f"{_DECISION_ROLE}\n\n" + StructuredPromptGenerator().generate_system_prompt(
+    "analyze",  # Use analyze type for decision making
+    additional_instructions=_DECISION_INSTRUCTIONS
+)
+_STATIC_PREFIXES = MappingProxyType({
+    action_type: StructuredPromptGenerator().generate_system_prompt(action_type)
+    for action_type in _PROMPT_ACTION_TYPES
+})
+
+@singledispatch
+def _json_default(value: Any) -> Any:
+    """Serialize values that orjson does not support natively.
+    
+    Dispatch is on the value's type and cached per class, so the models and
+    collections in every prompt context skip a chain of isinstance checks.
+    """
+    return str(value)
+
+@_json_default.register
+def _(value: BaseModel) -> Any:
+    return value.model_dump()
+
+@_json_default.register(deque)
+@_json_default.register(set)
+def _(value: Iterable) -> Any:
+    return list(value)
+
+def _dumps(value: Any, indent: bool = False) -> str:
+    """Serialize a value to JSON text with sorted keys using orjson.
+    
+    Sorting keeps the text byte-identical for equal values, which prompt
+    caching and response caching rely on. Prompts use the compact form, since
+    indentation adds tokens without helping the model.
+    """
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2 if indent else orjson.OPT_SORT_KEYS
+    return orjson.dumps(value, default=_json_default, option=option).decode()
+
+class _LazyJson:
+    """Log argument that is only serialized to JSON if the record is emitted."""
+    
+    __slots__ = ("value",)
+    
+    def __init__(self, value: Any):
+        self.value = value
+    
+    def __str__(self) -> str:
+        if isinstance(self.value, BaseModel):
+            return self.value.model_dump_json(indent=2)
+        return _dumps(self.value, indent=True)
+
+def _copy_containers(value: Any) -> Any:
+    """Copy the dicts, deques, lists and sets of a state value, sharing their items."""
+    if isinstance(value, deque):
+        return deque(value, maxlen=value.maxlen)
+    if isinstance(value, dict):
+        return {key: _copy_containers(item) for key, item in value.items()}
+    if isinstance(value, (list, set)):
+        return value.copy()
+    return value
+
+def _last_items(items: Iterable[Any], count: int) -> List[Any]:
+    """Return the last `count` items of a sequence or deque, oldest first."""
+    return list(islice(reversed(items), count))[::-1]
+
+def _log_prompt_cache_usage(response: Any) -> None:
+    """Log how much of a prompt was served from the provider's prompt cache."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    cache_read = (usage.get("input_token_details") or {}).get("cache_read")
+    if cache_read is not None:
+        logger.debug(
+            "Prompt cache read %d of %d input tokens", cache_read, usage.get("input_tokens", 0)
+        )
 
 class AIWorkflowSupervisor:
     """AI-driven workflow supervisor that dynamically controls the development process."""
     
-    def __init__(self, llm: ChatOpenAI):
+    def __init__(
+        self,
+        llm: ChatOpenAI,
+        embedder: Optional[Embeddings] = None,
+        decision_cache_threshold: float = 0.92,
+        llm_cache: Optional[LLMCache] = None,
+        batch_processor: Optional[BatchProcessor] = None,
+        fast_path: bool = True,
+        decision_cache: Optional[DecisionTemplateCache] = None
+    ):
         """Initialize the AI supervisor.
         
         Args:
             llm: The language model to use for decision making and execution
+            embedder: Optional embedding model; when set and no decision cache is
+                given, decisions are cached and reused for similar decision prompts
+            decision_cache_threshold: Minimum cosine similarity for reusing a decision
+            llm_cache: Optional cache of LLM responses; responses are not cached
+                unless one is given
+            batch_processor: Optional Batch API processor; when set, multi-file
+                code generation goes through it instead of online requests
+            fast_path: Whether to skip the decision LLM call for obvious next actions
+            decision_cache: Optional cache of decisions for recurring situations
         """
-        self.llm = llm
+        _configure_logging()
+        self.llm_cache = llm_cache
+        self.llm = CachedChatLLM(llm, llm_cache) if llm_cache is not None else llm
+        self.batch_llm = batch_processor
+        if batch_processor is not None and llm_cache is not None:
+            # Batched responses come from the same model, so they share cache entries
+            self.batch_llm = CachedChatLLM(batch_processor, llm_cache, self.llm.llm_string)
+        if decision_cache is None and embedder is not None:
+            decision_cache = DecisionTemplateCache(embedder, decision_cache_threshold)
+        self.decision_cache = decision_cache
+        self.fast_path = fast_path
         self.output_validator = OutputValidator()
         self.prompt_generator = StructuredPromptGenerator()
+        self._reset_project_caches()
+        self._validation_cache: "OrderedDict[Tuple[bytes, str, bytes], EnhancedActionResult]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+        self._history_stores: Dict[str, HistoryStore] = {}
+    
+    def _reset_project_caches(self) -> None:
+        """Forget the summaries and scans cached for the current project state."""
+        self._components_summary: Optional[Tuple[Tuple, List[Dict[str, Any]]]] = None
+        self._test_results_summary: Optional[Tuple[Tuple, List[Dict[str, Any]]]] = None
+        self._component_scan: Optional[Tuple[ProjectState, int, Tuple[List[str], bool]]] = None
+    
+    def clear_caches(self) -> None:
+        """Forget everything cached from earlier runs and close the history stores.
+        
+        A response cache shared with other workflows is cleared for them too.
+        """
+        self._reset_project_caches()
+        self._validation_cache.clear()
+        if self.llm_cache is not None:
+            self.llm_cache.clear()
+        if self.decision_cache is not None:
+            self.decision_cache.clear()
+        self.close_history_stores()
+    
+    def fork(self) -> "AIWorkflowSupervisor":
+        """Create a supervisor for another project, sharing this one's LLM and caches.
+        
+        The LLM, the response, decision and validation caches and the in-flight
+        calls are shared. The summaries and scans of the project state are
+        not, so projects run concurrently never evict or read each other's.
+        """
+        supervisor = copy.copy(self)
+        supervisor._reset_project_caches()
+        return supervisor
+    
+    def _fast_path_decision(self, state: ProjectState) -> Optional[ActionDecision]:
+        """Decide the next action without the LLM when the state makes it obvious.
+        
+        Returns:
+            The action to take, or None if the LLM should decide
+        """
+        if state.step_count == 0 and not state.components:
+            return ActionDecision(
+                action_type="analyze",
+                description="Analyze the project requirements",
+                context={"specific_focus": "requirements"}
+            )
+        if not state.components:
+            return None
+        
+        untested, any_failing = self._scan_components(state)
+        if untested:
+            return ActionDecision(
+                action_type="test",
+                description="Test the new and changed components",
+                context={"relevant_files": untested}
+            )
+        if not any_failing:
+            return ActionDecision(
+                action_type="complete",
+                description="All components pass their tests"
+            )
+        return None
+    
+    def _scan_components(self, state: ProjectState) -> Tuple[List[str], bool]:
+        """Find the untested components and whether any tested one needs refinement.
+        
+        The scan runs once per step and is shared by the fast path and the
+        decision cache; only components known to need refinement are checked
+        for failures.
+        
+        Returns:
+            Paths of components without a test of their current content, and
+            whether any other component failed or has suggestions
+        """
+        if self._component_scan is not None:
+            scanned_state, scanned_step, scan = self._component_scan
+            if scanned_state is state and scanned_step == state.step_count:
+                return scan
+        
+        untested = [
+            path for path in state.components
+            if self._current_test_result(state, path) is None
+        ]
+        any_failing = any(
+            self._current_test_result(state, path) is not None
+            for path in state.failing_paths
+        )
+        
+        self._component_scan = (state, state.step_count, (untested, any_failing))
+        return untested, any_failing
     
     async def decide_next_action(self, state: ProjectState) -> ActionDecision:
         """Determine the next action based on current project state.
@@ -55,81 +345,48 @@ class AIWorkflowSupervisor:
         """
         # Prepare context for decision-making
         context = {
-            "requirements": state.original_requirements,
             "current_context": state.current_context,
-            "components": [
-                {
-                    "path": path,
-                    "language": comp.language,
-                    "status": comp.status,
-                    "version": comp.version
-                }
-                for path, comp in state.components.items()
-            ],
-            "test_results": [
-                {
-                    "component": path,
-                    "passed": results[-1].passed if results else False,
-                    "suggestions": results[-1].suggestions if results else []
-                }
-                for path, results in state.test_results.items()
-            ],
+            "components": self._summarize_components(state),
+            "test_results": self._summarize_test_results(state),
             "step_count": state.step_count,
             "recent_actions": [
                 str(action)  # Now uses our custom __str__ implementation
-                for action in state.action_history[-3:]  # Last 3 actions for context
-            ] if state.action_history else []
+                for action in _last_items(state.action_history, 3)  # Last 3 actions for context
+            ]
         }
         
-        # Generate decision prompt with enhanced instructions
-        prompt = self.prompt_generator.generate_prompt(
-            "analyze",  # Use analyze type for decision making
-            context,
-            additional_instructions="""
-Consider:
-1. Project requirements and current progress
-2. Code quality and test results
-3. Recent actions and their outcomes
-4. Whether human input might be needed
-
-Your response must include:
-1. Insights about the current state
-2. Recommendations for next steps
-3. Code quality metrics if applicable
-4. Priority actions to take
-
-Also include a "decision" object in the metadata with this structure:
-{
-    "action_type": "string (e.g., 'analyze', 'generate', 'test', 'refactor', 'ask_human')",
-    "description": "string explaining the action",
-    "needs_human_input": boolean,
-    "human_query": "string (if needs_human_input is true)",
-    "context": {
-        "relevant_files": ["list of files to focus on"],
-        "specific_focus": "string describing specific aspect to address",
-        "expected_outcome": "string describing what this action should achieve"
-    }
-}"""
-        )
+        # Static instructions go first so providers can cache them as a prompt prefix;
+        # the per-step context is appended as the final message.
+        dynamic_prompt = self._render_dynamic(state.original_requirements, context)
+        messages = self.prompt_generator.build_messages(self.llm, _DECISION_PREFIX, dynamic_prompt)
         
-        messages = [
-            SystemMessage(content="You are an AI project manager overseeing a code generation project."),
-            HumanMessage(content=prompt)
-        ]
+        # Reuse a previous decision if the project is in the same situation
+        cache_key = None
+        if self.decision_cache is not None:
+            _, any_failing = self._scan_components(state)
+            cache_key = await self.decision_cache.key(state, dynamic_prompt, any_failing)
+            cached_decision = self.decision_cache.lookup(cache_key)
+            if cached_decision is not None:
+                logger.info("Reusing cached decision: %s", cached_decision)
+                return cached_decision
         
-        response = await self.llm.ainvoke(messages)
+        response = await self._single_flight(
+            messages_key(messages),
+            lambda: self.llm.ainvoke(messages)
+        )
+        _log_prompt_cache_usage(response)
         
         try:
             # Extract content and validate
             content = response.content if hasattr(response, 'content') else str(response)
-            logger.info(f"Raw LLM response for decision making:\n{content}")
+            logger.info("Raw LLM response for decision making:\n%s", content)
             
-            validated_result = await self.output_validator.validate_and_parse(
+            validated_result = await self._validate(
                 content,
                 "analyze",
                 context={"decision_making": True}
             )
-            logger.info(f"Validated decision result:\n{json.dumps(validated_result.dict(), indent=2)}")
+            logger.info("Validated decision result:\n%s", _LazyJson(validated_result))
             
             # Try to extract decision data from different places
             decision_data = None
@@ -150,7 +407,7 @@ Also include a "decision" object in the metadata with this structure:
                 if priority_actions:
                     first_action = priority_actions[0]
                     # Determine action type from the content
-                    action_type = "generate" if any(word in first_action.lower() for word in ["implement", "create", "build", "generate"]) else "analyze"
+                    action_type = "generate" if _GENERATE_KEYWORDS.search(first_action) else "analyze"
                     
                     decision_data = {
                         "action_type": action_type,
@@ -166,12 +423,15 @@ Also include a "decision" object in the metadata with this structure:
                     }
             
             if decision_data:
-                return ActionDecision(**decision_data)
+                decision = ActionDecision(**decision_data)
+                if cache_key is not None:
+                    self.decision_cache.store(cache_key, decision)
+                return decision
             else:
                 raise ValueError("Could not extract or construct valid decision data")
             
         except Exception as e:
-            logger.error(f"Error parsing AI decision: {e}")
+            logger.error("Error parsing AI decision: %s", e)
             # Return a safe default decision
             return ActionDecision(
                 action_type="analyze",
@@ -181,6 +441,90 @@ Also include a "decision" object in the metadata with this structure:
                 context={"error": str(e)}
             )
     
+    def _summarize_components(self, state: ProjectState) -> List[Dict[str, Any]]:
+        """Summarize components for the decision and action prompts.
+        
+        The summary is rebuilt only when a summarized field or the content of a
+        component changes; content hashes are computed once per component, so
+        checking the fingerprint does not rehash the code.
+        """
+        fingerprint = tuple(
+            (path, comp.language, comp.status, comp.version, comp.content_hash)
+            for path, comp in state.components.items()
+        )
+        if self._components_summary is None or self._components_summary[0] != fingerprint:
+            self._components_summary = (fingerprint, [
+                {
+                    "path": path,
+                    "language": comp.language,
+                    "status": comp.status,
+                    "version": comp.version
+                }
+                for path, comp in state.components.items()
+            ])
+        return self._components_summary[1]
+    
+    def _summarize_test_results(self, state: ProjectState) -> List[Dict[str, Any]]:
+        """Summarize the latest test result per component for the decision prompt.
+        
+        Test results are only ever appended, so the latest result of each
+        component is enough to detect changes; histories are bounded, so their
+        length alone is not.
+        """
+        latest = state.latest_test_results
+        fingerprint = (
+            hash(tuple(state.test_results)),
+            tuple(latest.get(path) for path in state.test_results)
+        )
+        if self._test_results_summary is None or self._test_results_summary[0] != fingerprint:
+            self._test_results_summary = (fingerprint, [
+                {
+                    "component": path,
+                    "passed": result.passed if result else False,
+                    "suggestions": result.suggestions if result else []
+                }
+                for path, result in zip(state.test_results, fingerprint[1])
+            ])
+        return self._test_results_summary[1]
+    
+    async def _validate(
+        self,
+        content: str,
+        action_type: str,
+        context: Optional[Dict[str, Any]] = None,
+        parsed: Optional[Dict[str, Any]] = None
+    ) -> EnhancedActionResult:
+        """Validate LLM output, reusing the result for output already validated.
+        
+        Successful validations are memoized by content, action type and context,
+        so identical output (e.g. a cached or repeated response) is parsed once.
+        `parsed` is the already decoded content, if available.
+        """
+        key = (
+            hashlib.blake2b(content.encode(), digest_size=16).digest(),
+            action_type,
+            hashlib.blake2b(
+                orjson.dumps(context, default=_json_default, option=orjson.OPT_SORT_KEYS),
+                digest_size=16
+            ).digest()
+        )
+        cached = self._validation_cache.get(key)
+        if cached is not None:
+            self._validation_cache.move_to_end(key)
+            return cached
+        
+        validated_result = await self.output_validator.validate_and_parse(
+            content,
+            action_type,
+            context=context,
+            parsed=parsed
+        )
+        if validated_result.execution_metadata.get("validation_successful"):
+            self._validation_cache[key] = validated_result
+            if len(self._validation_cache) > _VALIDATION_CACHE_SIZE:
+                self._validation_cache.popitem(last=False)
+        return validated_result
+    
     async def execute_step(self, state: ProjectState) -> ProjectState:
         """Execute a single step in the AI-controlled workflow.
         
@@ -190,57 +534,234 @@ Also include a "decision" object in the metadata with this structure:
         Returns:
             Updated project state
         """
+        return state.model_copy(update=await self.execute_step_updates(state))
+    
+    async def execute_step_updates(self, state: ProjectState) -> Dict[str, Any]:
+        """Execute a single step and return only the state fields it changed.
+        
+        Workflow nodes return this partial update so the graph merges the
+        changed fields instead of copying the whole state.
+        
+        Args:
+            state: Current project state
+            
+        Returns:
+            The changed state fields
+        """
+        # All changes of this step are accumulated here
+        updates: Dict[str, Any] = {}
+        action: Optional[ActionDecision] = None
         try:
             # Check if we've hit the step limit
             if state.step_count >= state.max_steps:
-                return state.model_copy(update={
+                state.error_log.append("Maximum steps reached")
+                return {
                     "status": CodeGenerationStatus.COMPLETE,
-                    "error_log": state.error_log + ["Maximum steps reached"]
-                })
+                    "error_log": state.error_log
+                }
             
             # If we have human feedback, incorporate it into the context
             if state.human_feedback:
                 state.current_context["human_feedback"] = state.human_feedback
                 state.human_feedback = None  # Clear after using
+                updates.update({
+                    "current_context": state.current_context,
+                    "human_feedback": None
+                })
             
-            # Get next action
-            action = await self.decide_next_action(state)
+            # Get next action, asking the LLM only when the state leaves it open
+            action = self._fast_path_decision(state) if self.fast_path else None
+            if action is None:
+                action = await self.decide_next_action(state)
             
-            # Update state with the decision
-            state = state.model_copy(update={
+            # Record the decision; the bounded history is appended in place
+            state.action_history.append(action)
+            updates.update({
                 "current_action": action,
-                "action_history": state.action_history + [action],
+                "action_history": state.action_history,
                 "step_count": state.step_count + 1
             })
             
             # If we need human input, update state and return
             if action.needs_human_input:
-                return state.model_copy(update={
+                updates.update({
                     "status": CodeGenerationStatus.NEEDS_HUMAN_INPUT,
                     "needs_human_input": True,
                     "human_query": action.human_query
                 })
+                return updates
+            
+            if action.action_type == "complete":
+                updates["status"] = CodeGenerationStatus.COMPLETE
+                return updates
             
             # Execute the action
-            logger.info(f"Executing action: {action.action_type} - {action.description}")
+            logger.info("Executing action: %s - %s", action.action_type, action.description)
             result = await self.execute_action(action, state)
-            logger.info(f"Action result:\n{json.dumps(result, indent=2)}")
+            logger.info("Action result:\n%s", _LazyJson(result))
+            
+            # Do not let a cached decision that just failed be reused
+            if self.decision_cache is not None and self._action_failed(result):
+                self.decision_cache.invalidate(action)
             
             # Update state based on result
-            updated_state = self.update_state_with_result(state, action, result)
-            logger.info(f"Updated state status: {updated_state.status}")
-            return updated_state
+            updates.update(self._result_updates(state, action, result, step=updates["step_count"]))
+            
+            # The in-memory history is bounded, so the full history goes to the
+            # store; the blocking write runs in a worker thread, and a failed
+            # write does not fail the step that already succeeded
+            if state.history_store_path:
+                history_entry = state.development_history[-1]
+                try:
+                    await asyncio.to_thread(
+                        self._history_store(state.history_store_path).append,
+                        history_entry["step"],
+                        history_entry["action"],
+                        result,
+                        history_entry["timestamp_ns"]
+                    )
+                except Exception as e:
+                    logger.warning("Could not write step %d to the history store: %s", history_entry["step"], e)
+            
+            logger.info("Updated state status: %s", updates["status"])
+            return updates
             
         except Exception as e:
-            logger.error(f"Error in execute_step: {e}")
-            return state.model_copy(update={
+            logger.error("Error in execute_step: %s", e)
+            if self.decision_cache is not None and action is not None:
+                self.decision_cache.invalidate(action)
+            state.error_log.append(f"Step execution error: {str(e)}")
+            updates.update({
                 "status": CodeGenerationStatus.ERROR,
-                "error_log": state.error_log + [f"Step execution error: {str(e)}"]
+                "error_log": state.error_log
             })
+            return updates
+    
+    @staticmethod
+    def _action_failed(result: Union[Dict[str, Any], List[Dict[str, Any]]]) -> bool:
+        """Check whether every part of an action result is an error."""
+        results = result if isinstance(result, list) else [result]
+        return bool(results) and all(
+            "error" in item or item.get("error_context") for item in results
+        )
     
-    async def execute_action(self, action: ActionDecision, state: ProjectState) -> Dict[str, Any]:
+    async def execute_action(
+        self, action: ActionDecision, state: ProjectState
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
         """Execute a specific action using the LLM.
         
+        Generate and test actions that target several independent files are split
+        into one sub-action per file, and the sub-actions are sent to the LLM as
+        a single batch.
+        
+        Args:
+            action: The action to execute
+            state: Current project state
+            
+        Returns:
+            Dictionary containing the result of the action, or a list of such
+            dictionaries when the action was split into per-file sub-actions
+        """
+        sub_actions = self._split_action(action)
+        
+        # Components whose content is unchanged since their last test are not retested
+        reused_results: List[Dict[str, Any]] = []
+        if action.action_type == "test":
+            sub_actions, reused_results = self._reuse_test_results(state, sub_actions)
+        if not reused_results:
+            if len(sub_actions) > 1:
+                logger.info("Executing %d %s sub-actions as one batch", len(sub_actions), action.action_type)
+                return await self.execute_actions_batch(sub_actions, state)
+            return await self._execute_one(action, state)
+        
+        logger.info("Reusing test results of %d unchanged components", len(reused_results))
+        if len(sub_actions) > 1:
+            return await self.execute_actions_batch(sub_actions, state) + reused_results
+        if sub_actions:
+            return [await self._execute_one(sub_actions[0], state)] + reused_results
+        return reused_results
+    
+    def _current_test_result(self, state: ProjectState, path: str) -> Optional[TestResult]:
+        """Get the latest test result of a component if it tested the current content."""
+        latest = state.latest_test_results.get(path)
+        component = state.components.get(path)
+        if latest is None or component is None:
+            return None
+        return latest if latest.tested_hash == component.content_hash else None
+    
+    def _reuse_test_results(
+        self, state: ProjectState, actions: List[ActionDecision]
+    ) -> Tuple[List[ActionDecision], List[Dict[str, Any]]]:
+        """Separate test sub-actions for unchanged components from those that need the LLM.
+        
+        Returns:
+            The actions still to execute, and results reusing the latest test
+            result of each component whose content has not changed since
+        """
+        remaining, reused = [], []
+        for action in actions:
+            relevant_files = action.context.get("relevant_files")
+            current = None
+            if isinstance(relevant_files, list) and len(relevant_files) == 1:
+                current = self._current_test_result(state, relevant_files[0])
+            if current is None:
+                remaining.append(action)
+            else:
+                reused.append({"output": {"test_results": [current.model_dump()]}})
+        return remaining, reused
+    
+    def _split_action(self, action: ActionDecision) -> List[ActionDecision]:
+        """Split an action into independent per-file sub-actions where possible."""
+        relevant_files = action.context.get("relevant_files")
+        if action.action_type not in _PARALLEL_ACTION_TYPES or not isinstance(relevant_files, list):
+            return [action]
+        
+        unique_files = list(dict.fromkeys(relevant_files))
+        if len(unique_files) < 2:
+            return [action]
+        return [
+            action.model_copy(update={"context": {**action.context, "relevant_files": [path]}})
+            for path in unique_files
+        ]
+    
+    async def execute_actions_batch(
+        self, actions: List[ActionDecision], state: ProjectState
+    ) -> List[Dict[str, Any]]:
+        """Execute several independent actions with a single batched LLM request.
+        
+        At most `state.max_concurrency` requests of the batch are in flight at once.
+        
+        Args:
+            actions: The actions to execute
+            state: Current project state
+            
+        Returns:
+            List of action results, in the same order as the actions
+        """
+        # The project context is shared by all sub-actions, so it is serialized once
+        project_context = self._shared_action_context(state)
+        
+        # Bulk code generation tolerates Batch API latency in exchange for its
+        # lower price, when enabled
+        llm = self.llm
+        if self.batch_llm is not None and all(action.action_type == "generate" for action in actions):
+            llm = self.batch_llm
+        
+        # Failed requests are returned rather than raised so the other
+        # sub-actions still complete
+        responses = await llm.abatch(
+            [self._build_action_messages(action, state, project_context) for action in actions],
+            config={"max_concurrency": state.max_concurrency},
+            return_exceptions=True
+        )
+        return list(await asyncio.gather(*(
+            self._parse_action_response(action, response)
+            for action, response in zip(actions, responses)
+        )))
+    
+    async def _execute_one(self, action: ActionDecision, state: ProjectState) -> Dict[str, Any]:
+        """Execute a single action through one LLM call.
+        
         Args:
             action: The action to execute
             state: Current project state
@@ -248,40 +769,181 @@ Also include a "decision" object in the metadata with this structure:
         Returns:
             Dictionary containing the result of the action
         """
-        # Generate appropriate prompt using StructuredPromptGenerator
-        prompt = self.prompt_generator.generate_prompt(
-            action.action_type,
-            {
-                "action": action.dict(),
-                "state": state.dict(),
-                "context": state.current_context
-            }
+        messages = self._build_action_messages(action, state)
+        content, parsed = await self._single_flight(
+            messages_key(messages),
+            lambda: self._stream_json_response(messages)
         )
+        return await self._parse_action_response(action, content, parsed=parsed)
+    
+    async def _single_flight(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run an LLM call once for all concurrent callers with the same key.
         
-        # Execute through LLM
-        messages = [
-            SystemMessage(content="You must respond with ONLY a JSON object, no additional text or explanation."),
-            HumanMessage(content=prompt)
-        ]
-        response = await self.llm.ainvoke(messages)
+        Later callers await the in-flight task of the first one instead of
+        sending a duplicate request. The task is shielded so a cancelled
+        caller does not cancel the call for everyone else.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+    
+    async def _stream_json_response(
+        self, messages: List[BaseMessage]
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Stream an LLM response until a complete JSON object has arrived.
+        
+        Chunks are scanned incrementally, so the end of the object is found in
+        a single pass and validation can start without waiting for any
+        trailing output.
+        
+        Returns:
+            Text of the first complete top-level JSON object together with the
+            decoded object, or the whole response and None if none could be decoded
+        """
+        parser = IncrementalJsonParser()
+        async with aclosing(self.llm.astream(messages)) as stream:
+            async for chunk in stream:
+                if not parser.feed(message_text(chunk)):
+                    continue
+                try:
+                    parsed = parser.result()
+                except ValueError:
+                    return parser.buffer, None
+                # The stream is closed early, so cache the complete object here
+                if self.llm_cache is not None:
+                    await self.llm_cache.set(messages, AIMessage(content=parser.text), self.llm.llm_string)
+                return parser.text, parsed
+        return parser.buffer, None
+    
+    def _build_action_messages(
+        self,
+        action: ActionDecision,
+        state: ProjectState,
+        project_context: Optional[str] = None
+    ) -> List[BaseMessage]:
+        """Build the LLM messages for executing an action.
+        
+        Args:
+            action: The action to execute
+            state: Current project state
+            project_context: The parts of the state shared by all actions of the
+                step, if already serialized
+        """
+        # Use the pre-rendered static prompt prefix and append the action and
+        # state as the dynamic tail
+        system_prompt = _STATIC_PREFIXES.get(action.action_type)
+        if system_prompt is None:
+            system_prompt = self.prompt_generator.generate_system_prompt(action.action_type)
+        if project_context is None:
+            project_context = self._shared_action_context(state)
+        dynamic_context = {
+            "action": action.model_dump(),
+            "state": self._state_projection(state, action)
+        }
+        return self.prompt_generator.build_messages(
+            self.llm,
+            system_prompt,
+            self._render_dynamic(state.original_requirements, dynamic_context, project_context)
+        )
+    
+    def _render_dynamic(
+        self,
+        requirements: str,
+        context: Dict[str, Any],
+        project_context: Optional[str] = None
+    ) -> str:
+        """Render the per-call message that follows the static prompt prefix.
+        
+        The requirements rarely change within a run, so they lead the message and
+        extend the cacheable prefix. The serialized project context, shared by
+        all sub-actions of a step, comes next, and the per-call context last.
+        """
+        header = f"Requirements:\n{requirements}\n\n---\n\n"
+        if project_context is not None:
+            header += f"Project context:\n{project_context}\n\n---\n\n"
+        return f"{header}Context:\n{_dumps(context)}"
+    
+    def _shared_action_context(self, state: ProjectState) -> str:
+        """Serialize the parts of the state that are the same for every action of a step.
+        
+        The project context and the summary of all components are rendered once
+        and shared by the prompts of all sub-actions, instead of each prompt
+        projecting and serializing every component again.
+        """
+        return _dumps({
+            "current_context": state.current_context,
+            "components": self._summarize_components(state)
+        })
+    
+    def _state_projection(self, state: ProjectState, action: ActionDecision) -> Dict[str, Any]:
+        """Project the state down to the parts an action needs.
+        
+        Components named in the action's relevant files are included in full;
+        all components are summarized in the shared context. Only the latest
+        actions are kept.
+        """
+        relevant_files = action.context.get("relevant_files")
+        if not isinstance(relevant_files, list):
+            relevant_files = []
+        
+        return {
+            "status": state.status,
+            "step_count": state.step_count,
+            "components": {
+                path: state.components[path].model_dump()
+                for path in relevant_files
+                if path in state.components
+            },
+            "test_results": {
+                path: state.latest_test_results[path].prompt_context
+                for path in relevant_files
+                if path in state.latest_test_results
+            },
+            "recent_actions": [
+                str(recent_action) for recent_action in _last_items(state.action_history, 3)
+            ]
+        }
+    
+    async def _parse_action_response(
+        self,
+        action: ActionDecision,
+        response: Any,
+        parsed: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Validate an LLM response for an action, repairing it if needed.
+        
+        `parsed` is the already decoded response, which saves parsing large
+        generated files a second time.
+        """
+        if isinstance(response, Exception):
+            logger.error("Error executing action: %s", response)
+            return {
+                "error": str(response),
+                "status": "failed",
+                "action_type": action.action_type
+            }
         
         try:
             # Extract content and validate using OutputValidator
             content = response.content if hasattr(response, 'content') else str(response)
-            logger.info(f"Raw LLM response for action {action.action_type}:\n{content}")
+            logger.info("Raw LLM response for action %s:\n%s", action.action_type, content)
             
-            validated_result = await self.output_validator.validate_and_parse(
+            validated_result = await self._validate(
                 content,
                 action.action_type,
-                context=action.context
+                context=action.context,
+                parsed=parsed
             )
-            logger.info(f"Validated action result:\n{json.dumps(validated_result.dict(), indent=2)}")
+            logger.info("Validated action result:\n%s", _LazyJson(validated_result))
             
             # Return the validated result
-            return validated_result.dict()
+            return validated_result.model_dump()
             
         except Exception as e:
-            logger.error(f"Error executing action: {e}")
+            logger.error("Error executing action: %s", e)
             # Try to repair malformed output
             try:
                 repaired_output = await self.output_validator.repair_malformed_output(
@@ -290,153 +952,218 @@ Also include a "decision" object in the metadata with this structure:
                     self._get_expected_schema(action.action_type)
                 )
                 # Validate and return repaired output
-                validated_result = await self.output_validator.validate_and_parse(
+                validated_result = await self._validate(
                     repaired_output,
                     action.action_type,
                     context=action.context
                 )
-                return validated_result.dict()
+                return validated_result.model_dump()
             except Exception as repair_error:
-                logger.error(f"Error repairing output: {repair_error}")
+                logger.error("Error repairing output: %s", repair_error)
                 return {
                     "error": str(e),
                     "status": "failed",
                     "action_type": action.action_type
                 }
     
-    def _get_expected_schema(self, action_type: str) -> Dict[str, Any]:
+    def _get_expected_schema(self, action_type: str) -> Mapping[str, Any]:
         """Get the expected schema for a given action type."""
-        if action_type == "analyze":
-            return {
-                "insights": ["string"],
-                "recommendations": ["string"],
-                "code_quality_metrics": {
-                    "complexity": "float",
-                    "maintainability": "float",
-                    "documentation": "float"
-                },
-                "priority_actions": ["string"]
-            }
-        elif action_type == "generate":
-            return {
-                "file_path": "string",
-                "content": "string",
-                "language": "string",
-                "dependencies": ["string"],
-                "quality_checks": {
-                    "syntax_valid": "boolean",
-                    "follows_style_guide": "boolean",
-                    "has_documentation": "boolean"
-                }
-            }
-        elif action_type == "test":
-            return {
-                "test_cases": [{
-                    "name": "string",
-                    "status": "string",
-                    "error_message": "string (optional)"
-                }],
-                "coverage": {
-                    "line_coverage": "float",
-                    "branch_coverage": "float"
-                }
-            }
-        else:
-            return {}
+        return _EXPECTED_SCHEMAS.get(action_type, _EMPTY_SCHEMA)
     
-    def validate_action_result(self, result: Dict[str, Any], action: ActionDecision) -> Dict[str, Any]:
-        """Validate and process the result of an action.
+    def update_state_with_result(
+        self,
+        state: ProjectState,
+        action: ActionDecision,
+        result: Union[Dict[str, Any], List[Dict[str, Any]]]
+    ) -> ProjectState:
+        """Update the project state based on an action's result.
         
         Args:
-            result: Raw result from LLM
+            state: Current project state
             action: The action that was executed
+            result: Result of the action, or a list of per-file sub-action results
             
         Returns:
-            Validated and processed result
+            Updated project state
         """
-        # Add metadata to result
-        result["action_type"] = action.action_type
-        
-        # Validate based on action type
-        if action.action_type == "generate" and "file_path" not in result:
-            raise ValueError("Code generation result must include file_path")
-        elif action.action_type == "test" and "test_results" not in result:
-            raise ValueError("Test result must include test_results array")
-            
-        return result
+        return state.model_copy(
+            update=self._result_updates(state, action, result, step=state.step_count)
+        )
     
-    def update_state_with_result(
-        self, state: ProjectState, action: ActionDecision, result: Dict[str, Any]
-    ) -> ProjectState:
-        """Update the project state based on an action's result.
+    def _result_updates(
+        self,
+        state: ProjectState,
+        action: ActionDecision,
+        result: Union[Dict[str, Any], List[Dict[str, Any]]],
+        step: int
+    ) -> Dict[str, Any]:
+        """Compute the state changes produced by an action's result.
+        
+        The context, components, test results and the development history are
+        updated in place; the returned dictionary still names every field that
+        changed.
         
         Args:
             state: Current project state
             action: The action that was executed
-            result: Result of the action
+            result: Result of the action, or a list of per-file sub-action results
+            step: Step number to record in the development history
             
         Returns:
-            Updated project state
+            Dictionary of field updates to apply to the state
         """
+        state.current_context[f"last_{action.action_type}_result"] = result
         updates = {
             "status": CodeGenerationStatus.IN_PROGRESS,
-            "current_context": {
-                **state.current_context,
-                f"last_{action.action_type}_result": result
-            }
+            "current_context": state.current_context
         }
         
-        # Handle specific action types
-        if action.action_type == "generate" and "error" not in result:
-            new_component = CodeComponent(
-                file_path=result["file_path"],
-                content=result["content"],
-                language=result["language"],
-                dependencies=result.get("dependencies", [])
-            )
-            updates["components"] = {
-                **state.components,
-                result["file_path"]: new_component
-            }
-        elif action.action_type == "test" and "error" not in result:
-            new_test_results = {}
-            for test_result in result["test_results"]:
-                path = test_result["component_path"]
-                new_result = TestResult(
-                    component_path=path,
-                    status="completed",
-                    passed=test_result["passed"],
-                    error_message=test_result.get("error_message"),
-                    execution_time=0.0,  # TODO: Add actual timing
-                    suggestions=test_result.get("suggestions", [])
+        # Results of per-file sub-actions arrive as a list and are merged in one
+        # pass; components and test results are updated in place instead of copied
+        results = result if isinstance(result, list) else [result]
+        components_changed = False
+        test_results_changed = False
+        for sub_result in results:
+            if "error" in sub_result or sub_result.get("error_context"):
+                continue
+            output = sub_result.get("output", sub_result)
+            
+            # Handle specific action types
+            if action.action_type == "generate" and output.get("file_path"):
+                components_changed = True
+                state.components[output["file_path"]] = CodeComponent(
+                    file_path=output["file_path"],
+                    content=output["content"],
+                    language=output["language"],
+                    dependencies=output.get("dependencies", [])
                 )
-                existing_results = state.test_results.get(path, [])
-                new_test_results[path] = existing_results + [new_result]
-            updates["test_results"] = new_test_results
+            elif action.action_type == "test":
+                for test_result in self._extract_test_results(action, output):
+                    path = test_result["component_path"]
+                    component = state.components.get(path)
+                    new_result = TestResult(
+                        component_path=path,
+                        status="completed",
+                        passed=test_result["passed"],
+                        error_message=test_result.get("error_message"),
+                        execution_time=0.0,  # TODO: Add actual timing
+                        suggestions=test_result.get("suggestions", []),
+                        tested_hash=component.content_hash if component is not None else None
+                    )
+                    test_results_changed = True
+                    state.test_results.setdefault(path, bounded_test_results()).append(new_result)
+                    state.latest_test_results[path] = new_result
+                    if new_result.needs_refinement:
+                        state.failing_paths.add(path)
+                    else:
+                        state.failing_paths.discard(path)
+        
+        if components_changed:
+            updates["components"] = state.components
+            self._components_summary = None
+        if test_results_changed:
+            updates["test_results"] = state.test_results
+            updates["latest_test_results"] = state.latest_test_results
+            updates["failing_paths"] = state.failing_paths
+            self._test_results_summary = None
         
         # Add to development history
+        # A raw timestamp is cheap to take; it is only formatted when displayed
         history_entry = {
-            "step": state.step_count,
-            "action": action.dict(),
+            "step": step,
+            "timestamp_ns": time.time_ns(),
+            "action": action.model_dump(),
             "result": result
         }
-        updates["development_history"] = state.development_history + [history_entry]
+        state.development_history.append(history_entry)
+        updates["development_history"] = state.development_history
         
-        return state.model_copy(update=updates)
+        return updates
+    
+    def _history_store(self, path: str) -> HistoryStore:
+        """Get the history store at the given path, opening it on first use."""
+        store = self._history_stores.get(path)
+        if store is None:
+            store = self._history_stores[path] = HistoryStore(path)
+        return store
+    
+    def close_history_stores(self) -> None:
+        """Close the history stores opened so far; later steps open them again."""
+        stores = list(self._history_stores.values())
+        self._history_stores.clear()
+        for store in stores:
+            store.close()
+    
+    def _extract_test_results(self, action: ActionDecision, output: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Extract per-component test results from a test action's output.
+        
+        Outputs that do not report results per component are attributed to the
+        files the (sub-)action was run against.
+        """
+        if "test_results" in output:
+            return output["test_results"]
+        
+        action_context = output.get("metadata", {}).get("context") or action.context
+        failures = output.get("failures") or []
+        passed = not failures and all(
+            str(test_case.get("status", "")).lower() == "passed"
+            for test_case in output.get("test_cases", [])
+        )
+        error_message = "\n".join(
+            str(failure.get("message", failure)) for failure in failures
+        ) or None
+        return [
+            {
+                "component_path": path,
+                "passed": passed,
+                "error_message": error_message,
+                "suggestions": []
+            }
+            for path in action_context.get("relevant_files", [])
+        ]
 
 class AIControlledWorkflow:
     """Main workflow class implementing AI-controlled development process."""
     
-    def __init__(self, llm: ChatOpenAI):
+    # The graph topology is the same for every instance, so it is compiled once
+    _compiled_graph: ClassVar[Optional[Runnable]] = None
+    
+    def __init__(
+        self,
+        llm: ChatOpenAI,
+        embedder: Optional[Embeddings] = None,
+        use_batch_api: bool = False,
+        llm_cache: Optional[LLMCache] = None
+    ):
         """Initialize the AI-controlled workflow.
         
         Args:
             llm: The language model to use
+            embedder: Optional embedding model enabling the supervisor's decision cache
+            use_batch_api: Whether to generate multiple files through the OpenAI Batch API
+            llm_cache: Optional cache of LLM responses, e.g. shared with other
+                workflows; responses are not cached unless one is given
         """
-        self.ai_supervisor = AIWorkflowSupervisor(llm)
-        self.workflow = self._create_workflow()
+        self.ai_supervisor = AIWorkflowSupervisor(
+            llm,
+            embedder=embedder,
+            llm_cache=llm_cache,
+            batch_processor=BatchProcessor.from_llm(llm) if use_batch_api else None
+        )
+        # Workflow runs in progress; history stores are closed when the last one ends
+        self._active_runs = 0
+        # Nodes find this instance in the config the graph passes to them
+        self.workflow = self._graph().with_config(configurable={"workflow": self})
     
-    def _create_workflow(self) -> StateGraph:
+    @classmethod
+    def _graph(cls) -> Runnable:
+        """Get the compiled workflow graph shared by all instances of the class."""
+        if cls.__dict__.get("_compiled_graph") is None:
+            cls._compiled_graph = cls._create_workflow()
+        return cls._compiled_graph
+    
+    @classmethod
+    def _create_workflow(cls) -> Runnable:
         """Create the workflow graph.
         
         Returns:
@@ -445,7 +1172,7 @@ class AIControlledWorkflow:
         workflow = StateGraph(ProjectState)
         
         # Add the main execution node
-        workflow.add_node("execute_step", self.ai_supervisor.execute_step)
+        workflow.add_node("execute_step", cls._execute_step_node)
         
         # Add edges
         workflow.add_edge(START, "execute_step")
@@ -453,7 +1180,7 @@ class AIControlledWorkflow:
         # Add conditional edges based on state
         workflow.add_conditional_edges(
             "execute_step",
-            self._get_next_node,
+            cls._get_next_node,
             {
                 "continue": "execute_step",
                 "complete": END
@@ -462,7 +1189,76 @@ class AIControlledWorkflow:
         
         return workflow.compile()
     
-    def _get_next_node(self, state: ProjectState) -> str:
+    @staticmethod
+    async def _execute_step_node(state: ProjectState, config: RunnableConfig) -> Dict[str, Any]:
+        """Run a workflow step on the instance and supervisor the graph was invoked with."""
+        configurable = config["configurable"]
+        supervisor = configurable.get("supervisor") or configurable["workflow"].ai_supervisor
+        return await supervisor.execute_step_updates(state)
+    
+    def clear_caches(self) -> None:
+        """Forget the responses, decisions and summaries cached by earlier runs."""
+        self.ai_supervisor.clear_caches()
+    
+    async def astream_steps(self, state: ProjectState) -> AsyncIterator[Dict[str, Any]]:
+        """Run the workflow, yielding the project state as each step is applied.
+        
+        The initial state is yielded first and the final state last, so callers
+        can follow progress without waiting for the whole run to finish.
+        
+        Later steps update histories, components and test results in place,
+        so each state is yielded with copies of its containers; a state kept
+        by the caller stays as it was at that step.
+        
+        Args:
+            state: Initial project state
+        """
+        async with self._run_scope():
+            async for values in self.workflow.astream(state.model_dump(), stream_mode="values"):
+                yield _copy_containers(values)
+    
+    async def run_batch(
+        self, states: List[ProjectState], max_concurrency: int = 16
+    ) -> List[ProjectState]:
+        """Run the workflow for several projects concurrently on the current event loop.
+        
+        All runs share this workflow's LLM client, so its connection pool is
+        reused across projects. Each run has its own fork of the supervisor, so
+        the caches of one project's state are not evicted by the others.
+        
+        Args:
+            states: Initial states of the projects to run
+            max_concurrency: Maximum number of workflow runs in flight at once
+            
+        Returns:
+            The final state of each project, in the order of the inputs
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run_one(state: ProjectState) -> ProjectState:
+            async with semaphore:
+                final_state = await self.workflow.ainvoke(
+                    state.model_dump(),
+                    config={"configurable": {"supervisor": self.ai_supervisor.fork()}}
+                )
+            return ProjectState(**final_state)
+        
+        async with self._run_scope():
+            return list(await asyncio.gather(*(run_one(state) for state in states)))
+    
+    @asynccontextmanager
+    async def _run_scope(self) -> AsyncIterator[None]:
+        """Track a workflow run, closing the history stores once no run is left."""
+        self._active_runs += 1
+        try:
+            yield
+        finally:
+            self._active_runs -= 1
+            if not self._active_runs:
+                self.ai_supervisor.close_history_stores()
+    
+    @staticmethod
+    def _get_next_node(state: ProjectState) -> str:
         """Determine whether to continue or end the workflow.
         
         Args:
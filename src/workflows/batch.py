@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+import orjson
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI
+
+from src.workflows.llm_cache import message_text
+
+logger = logging.getLogger(__name__)
+
+_BATCH_ENDPOINT = "/v1/chat/completions"
+_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+_MESSAGE_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+class BatchProcessor:
+    """Runs chat completions through the OpenAI Batch API.
+
+    Batched requests cost half as much as online ones but may take minutes to
+    complete, so this suits bulk work where latency is not critical.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        request_params: Optional[Dict[str, Any]] = None,
+        poll_interval: float = 30.0
+    ):
+        """Initialize the batch processor.
+
+        Args:
+            client: The OpenAI client to submit batches with
+            model: Name of the chat model to use
+            request_params: Extra chat-completion parameters, e.g. temperature
+            poll_interval: Seconds to wait between batch status checks
+        """
+        self.client = client
+        self.model = model
+        self.request_params = request_params or {}
+        self.poll_interval = poll_interval
+
+    @classmethod
+    def from_llm(cls, llm: ChatOpenAI, poll_interval: float = 30.0) -> "BatchProcessor":
+        """Create a batch processor using the client and settings of a chat model."""
+        request_params = {
+            name: value
+            for name, value in (("temperature", llm.temperature), ("max_tokens", llm.max_tokens))
+            if value is not None
+        }
+        return cls(llm.root_async_client, llm.model_name, request_params, poll_interval)
+
+    async def run_batch(self, requests: List[List[BaseMessage]]) -> List[Union[AIMessage, Exception]]:
+        """Run a list of chat requests as one batch job.
+
+        Args:
+            requests: The message lists to send, one per chat completion
+
+        Returns:
+            The response for each request in order, or the exception for
+            requests that failed
+        """
+        batch_file = await self.client.files.create(
+            file=("batch.jsonl", self._build_batch_file(requests)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=_BATCH_ENDPOINT,
+            completion_window="24h"
+        )
+        logger.info("Submitted batch %s with %d requests", batch.id, len(requests))
+
+        while batch.status not in _TERMINAL_STATUSES:
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+        if batch.status != "completed" or batch.output_file_id is None:
+            raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}")
+
+        output = await self.client.files.content(batch.output_file_id)
+        return self._parse_batch_output(output.text, len(requests))
+
+    async def abatch(
+        self, inputs: List[List[BaseMessage]], config: Optional[Any] = None, **kwargs: Any
+    ) -> List[Union[AIMessage, Exception]]:
+        """Run the inputs as one batch job, mirroring the chat model batch interface.
+
+        Failed requests are always returned as exceptions; config is ignored.
+        """
+        try:
+            return await self.run_batch(inputs)
+        except Exception as e:
+            logger.error("Batch job failed: %s", e)
+            return [e] * len(inputs)
+
+    def _build_batch_file(self, requests: List[List[BaseMessage]]) -> bytes:
+        """Encode the requests as a batch input file with one request per line."""
+        return b"\n".join(
+            orjson.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": _BATCH_ENDPOINT,
+                "body": {
+                    "model": self.model,
+                    "messages": [
+                        {"role": _MESSAGE_ROLES[message.type], "content": message_text(message)}
+                        for message in messages
+                    ],
+                    **self.request_params
+                }
+            })
+            for index, messages in enumerate(requests)
+        )
+
+    def _parse_batch_output(self, text: str, count: int) -> List[Union[AIMessage, Exception]]:
+        """Match the lines of a batch output file back to their requests."""
+        results: List[Union[AIMessage, Exception]] = [
+            RuntimeError("No result returned for batch request") for _ in range(count)
+        ]
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            entry = orjson.loads(line)
+            index = int(entry["custom_id"])
+            response = entry.get("response") or {}
+            if entry.get("error") or response.get("status_code") != 200:
+                results[index] = RuntimeError(
+                    f"Batch request failed: {entry.get('error') or response.get('body')}"
+                )
+                continue
+            results[index] = AIMessage(
+                content=response["body"]["choices"][0]["message"]["content"] or ""
+            )
+        return results
@@ -0,0 +1,139 @@
+import logging
+import math
+import operator
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from src.state.schema import ActionDecision, ProjectState
+
+logger = logging.getLogger(__name__)
+
+_DECISION_CACHE_SIZE = 512
+_STEP_BUCKET_SIZE = 5
+
+class DecisionCacheKey(NamedTuple):
+    """Lookup key of a decision prompt, computed once and reused to store the decision."""
+    fingerprint: Tuple[Any, ...]
+    trajectory: Tuple[str, ...]
+    embedding: Optional[List[float]]
+
+class DecisionTemplateCache:
+    """Cache of supervisor decisions for recurring project situations.
+
+    Decisions are looked up by an exact fingerprint of the project state
+    first, then, when an embedder is configured, by cosine similarity of the
+    decision prompt among decisions taken after the same recent actions.
+    Decisions whose execution failed are dropped so they are not repeated.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embeddings] = None,
+        similarity_threshold: float = 0.92,
+        max_size: int = _DECISION_CACHE_SIZE
+    ):
+        """Initialize the decision cache.
+
+        Args:
+            embedder: Optional embedding model enabling similarity lookups
+            similarity_threshold: Minimum cosine similarity for reusing a decision
+            max_size: Maximum number of decisions kept per lookup tier
+        """
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self._exact: "OrderedDict[Tuple[Any, ...], ActionDecision]" = OrderedDict()
+        self._similar: deque = deque(maxlen=max_size)
+
+    @staticmethod
+    def fingerprint(
+        state: ProjectState,
+        trajectory: Tuple[str, ...],
+        any_failing_tests: Optional[bool] = None
+    ) -> Tuple[Any, ...]:
+        """Get the coarse fingerprint of a project situation.
+
+        Args:
+            state: Current project state
+            trajectory: Types of the most recent actions, oldest first
+            any_failing_tests: Whether any component needs refinement, if the
+                caller has already scanned the test results
+        """
+        if any_failing_tests is None:
+            any_failing_tests = bool(state.failing_paths)
+        return (
+            hash(state.original_requirements),
+            trajectory,
+            len(state.components),
+            any_failing_tests,
+            state.step_count // _STEP_BUCKET_SIZE
+        )
+
+    async def key(
+        self, state: ProjectState, prompt: str, any_failing_tests: Optional[bool] = None
+    ) -> DecisionCacheKey:
+        """Build the lookup key for a decision prompt.
+
+        Args:
+            state: Current project state
+            prompt: The rendered decision prompt, embedded for similarity lookups
+            any_failing_tests: Whether any component needs refinement, if known
+        """
+        recent_actions = islice(reversed(state.action_history), 3)
+        trajectory = tuple(action.action_type for action in recent_actions)[::-1]
+        embedding = None
+        if self.embedder is not None:
+            try:
+                embedding = await self.embedder.aembed_query(prompt)
+            except Exception as e:
+                logger.warning("Could not embed decision prompt, skipping similarity lookup: %s", e)
+            else:
+                norm = math.sqrt(sum(value * value for value in embedding)) or 1.0
+                embedding = [value / norm for value in embedding]
+        return DecisionCacheKey(
+            self.fingerprint(state, trajectory, any_failing_tests), trajectory, embedding
+        )
+
+    def lookup(self, key: DecisionCacheKey) -> Optional[ActionDecision]:
+        """Find a cached decision for the key, or None if the LLM should decide."""
+        decision = self._exact.get(key.fingerprint)
+        if decision is not None:
+            self._exact.move_to_end(key.fingerprint)
+            return decision.model_copy(deep=True)
+
+        if key.embedding is None:
+            return None
+        best_score, best_decision = 0.0, None
+        for cached_trajectory, cached_embedding, cached_decision in self._similar:
+            if cached_trajectory != key.trajectory:
+                continue
+            score = sum(map(operator.mul, key.embedding, cached_embedding))
+            if score > best_score:
+                best_score, best_decision = score, cached_decision
+        if best_decision is None or best_score < self.similarity_threshold:
+            return None
+        return best_decision.model_copy(deep=True)
+
+    def store(self, key: DecisionCacheKey, decision: ActionDecision) -> None:
+        """Remember the decision taken for the key."""
+        self._exact[key.fingerprint] = decision
+        if len(self._exact) > self.max_size:
+            self._exact.popitem(last=False)
+        if key.embedding is not None:
+            self._similar.append((key.trajectory, key.embedding, decision))
+
+    def invalidate(self, decision: ActionDecision) -> None:
+        """Drop every cached copy of a decision whose execution failed."""
+        for fingerprint in [fp for fp, cached in self._exact.items() if cached == decision]:
+            del self._exact[fingerprint]
+        remaining = [entry for entry in self._similar if entry[2] != decision]
+        if len(remaining) != len(self._similar):
+            self._similar = deque(remaining, maxlen=self.max_size)
+
+    def clear(self) -> None:
+        """Drop every cached decision."""
+        self._exact.clear()
+        self._similar.clear()
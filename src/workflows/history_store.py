@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, Union
+
+import orjson
+
+# Number of rows read from the database at a time while iterating
+_FETCH_SIZE = 256
+
+class HistoryStore:
+    """Append-only SQLite log of the development history.
+
+    Entries are written as they happen instead of being kept in memory, and
+    read back through an iterator so the full history never has to be loaded.
+    The connection is shared by the threads writing to the store, so every
+    use of it holds the store's lock.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Open the history database, creating it if needed.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                step INTEGER NOT NULL,
+                timestamp_ns INTEGER NOT NULL,
+                action BLOB NOT NULL,
+                result BLOB NOT NULL
+            )"""
+        )
+        self._connection.commit()
+
+    def append(self, step: int, action: Dict[str, Any], result: Any, timestamp_ns: int) -> None:
+        """Append an entry to the history.
+
+        The write blocks until it is committed, so async callers should run it
+        in a worker thread.
+        """
+        row = (
+            step,
+            timestamp_ns,
+            orjson.dumps(action, default=str),
+            orjson.dumps(result, default=str)
+        )
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO history (step, timestamp_ns, action, result) VALUES (?, ?, ?, ?)",
+                row
+            )
+            self._connection.commit()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the history entries, oldest first."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT step, timestamp_ns, action, result FROM history ORDER BY id"
+            )
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(_FETCH_SIZE)
+            if not rows:
+                return
+            for step, timestamp_ns, action, result in rows:
+                yield {
+                    "step": step,
+                    "timestamp_ns": timestamp_ns,
+                    "action": orjson.loads(action),
+                    "result": orjson.loads(result)
+                }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,120 @@
+import json
+from typing import Any, List, Optional
+
+import orjson
+
+def loads_json(text: str) -> Any:
+    """Decode JSON with orjson, falling back to the standard library.
+
+    orjson is several times faster on large payloads such as generated files,
+    but rejects a few inputs the standard library accepts (e.g. NaN).
+    """
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return json.loads(text)
+
+class IncrementalJsonParser:
+    """Finds the first top-level JSON object in text that arrives in chunks.
+
+    Each chunk is scanned once while tracking nesting depth and string state,
+    so detecting the end of the object is linear in the response length no
+    matter how many chunks contain closing braces. Text before the opening
+    brace and after the closing one is ignored.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._offset = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def complete(self) -> bool:
+        """Whether the first top-level object has been fully received."""
+        return self._end is not None
+
+    @property
+    def buffer(self) -> str:
+        """All text fed so far."""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    @property
+    def text(self) -> Optional[str]:
+        """Text of the complete top-level object, or None if it has not closed yet."""
+        if self._end is None:
+            return None
+        return self.buffer[self._start:self._end]
+
+    def feed(self, chunk: str) -> bool:
+        """Scan the next chunk of text.
+
+        Args:
+            chunk: The text received since the previous call
+
+        Returns:
+            True once the first top-level object is complete
+        """
+        if self._end is not None:
+            return True
+        self._chunks.append(chunk)
+
+        pos, length = 0, len(chunk)
+        while pos < length:
+            if self._in_string:
+                # Jump straight to the next quote or escape inside strings,
+                # which hold most of the text (e.g. generated code)
+                if self._escaped:
+                    self._escaped = False
+                    pos += 1
+                    continue
+                quote = chunk.find('"', pos)
+                backslash = chunk.find("\\", pos, quote if quote != -1 else length)
+                if backslash != -1:
+                    self._escaped = True
+                    pos = backslash + 1
+                elif quote != -1:
+                    self._in_string = False
+                    pos = quote + 1
+                else:
+                    pos = length
+                continue
+
+            if self._start is None:
+                brace = chunk.find("{", pos)
+                if brace == -1:
+                    break
+                self._start = self._offset + brace
+                self._depth = 1
+                pos = brace + 1
+                continue
+
+            char = chunk[pos]
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = self._offset + pos + 1
+                    break
+            pos += 1
+
+        self._offset += length
+        return self._end is not None
+
+    def result(self) -> Any:
+        """Decode the complete top-level object.
+
+        Raises:
+            ValueError: If the object is not complete or is not valid JSON
+        """
+        if self._end is None:
+            raise ValueError("JSON object is not complete")
+        return loads_json(self.text)
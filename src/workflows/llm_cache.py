@@ -0,0 +1,276 @@
+import hashlib
+import logging
+import math
+import operator
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import orjson
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+_EXACT_CACHE_SIZE = 1024
+_SEMANTIC_CACHE_SIZE = 256
+
+def messages_key(messages: Sequence[BaseMessage], llm_string: str = "") -> str:
+    """Get a stable key identifying a list of prompt messages sent to a model.
+
+    Args:
+        messages: The prompt messages
+        llm_string: Identifies the model and its settings, so that responses of
+            different models are never confused
+    """
+    payload = orjson.dumps(
+        [llm_string, [(message.type, message.content) for message in messages]],
+        option=orjson.OPT_SORT_KEYS
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+def coalesce(keys: Sequence[Hashable]) -> Tuple[List[int], List[int]]:
+    """Group identical requests so each distinct one is only sent once.
+
+    Args:
+        keys: A key per request; requests with equal keys are interchangeable
+
+    Returns:
+        The index of the first request of each distinct key, and for every
+        request the position of its distinct key in that list
+    """
+    positions: Dict[Hashable, int] = {}
+    firsts: List[int] = []
+    mapping: List[int] = []
+    for index, key in enumerate(keys):
+        position = positions.get(key)
+        if position is None:
+            position = positions[key] = len(firsts)
+            firsts.append(index)
+        mapping.append(position)
+    return firsts, mapping
+
+def message_text(message: BaseMessage) -> str:
+    """Get the text of a message whose content may be a list of content blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in message.content
+    )
+
+class LLMCache:
+    """Two-tier cache of LLM responses keyed by the prompt messages.
+
+    The first tier matches the exact messages. The optional second tier, enabled
+    by passing an embedder, reuses the response to an earlier prompt whose last
+    message is semantically similar and whose preceding messages are identical.
+    Entries are scoped to the model that produced them and, when a ttl is set,
+    expire after that many seconds.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embeddings] = None,
+        similarity_threshold: float = 0.92,
+        max_size: int = _EXACT_CACHE_SIZE,
+        ttl: Optional[float] = None
+    ):
+        """Initialize the cache.
+
+        Args:
+            embedder: Optional embedding model enabling the semantic tier
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            max_size: Maximum number of exact entries kept
+            ttl: Optional lifetime of entries in seconds
+        """
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._exact: "OrderedDict[str, Tuple[BaseMessage, float]]" = OrderedDict()
+        self._semantic: deque = deque(maxlen=_SEMANTIC_CACHE_SIZE)
+
+    def _expired(self, stored_at: float) -> bool:
+        """Check whether an entry stored at the given time has outlived the ttl."""
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    async def get(self, messages: Sequence[BaseMessage], llm_string: str = "") -> Optional[BaseMessage]:
+        """Get the cached response for the messages sent to a model, if any."""
+        key = messages_key(messages, llm_string)
+        entry = self._exact.get(key)
+        if entry is not None:
+            response, stored_at = entry
+            if not self._expired(stored_at):
+                self._exact.move_to_end(key)
+                return response
+            del self._exact[key]
+
+        if self.embedder is None or not messages or not self._semantic:
+            return None
+        embedding = await self._embed(messages[-1])
+        if embedding is None:
+            return None
+        prefix = messages_key(messages[:-1], llm_string)
+        best_score, best_response = 0.0, None
+        for cached_prefix, cached_embedding, cached_response, stored_at in self._semantic:
+            if cached_prefix != prefix or self._expired(stored_at):
+                continue
+            score = sum(map(operator.mul, embedding, cached_embedding))
+            if score > best_score:
+                best_score, best_response = score, cached_response
+        if best_score < self.similarity_threshold:
+            return None
+        return best_response
+
+    async def set(
+        self, messages: Sequence[BaseMessage], response: BaseMessage, llm_string: str = ""
+    ) -> None:
+        """Store the response of a model to the messages."""
+        stored_at = time.monotonic()
+        key = messages_key(messages, llm_string)
+        self._exact[key] = (response, stored_at)
+        self._exact.move_to_end(key)
+        if len(self._exact) > self.max_size:
+            self._exact.popitem(last=False)
+
+        if self.embedder is None or not messages:
+            return
+        embedding = await self._embed(messages[-1])
+        if embedding is not None:
+            self._semantic.append(
+                (messages_key(messages[:-1], llm_string), embedding, response, stored_at)
+            )
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        self._exact.clear()
+        self._semantic.clear()
+
+    async def _embed(self, message: BaseMessage) -> Optional[List[float]]:
+        """Embed a message as a normalized vector, or return None on failure."""
+        try:
+            embedding = await self.embedder.aembed_query(message_text(message))
+        except Exception as e:
+            logger.warning("Could not embed prompt, skipping semantic cache: %s", e)
+            return None
+        norm = math.sqrt(sum(value * value for value in embedding)) or 1.0
+        return [value / norm for value in embedding]
+
+class CachedChatLLM(Runnable[LanguageModelInput, BaseMessage]):
+    """Chat model wrapper serving repeated prompts from an LLMCache.
+
+    Calls with extra model arguments (e.g. max_tokens) bypass the cache, since
+    their responses are not interchangeable with regular ones, and so do
+    synchronous calls. Being a Runnable, the wrapper can take the model's place
+    in chains. Any other attribute is looked up on the wrapped model.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        cache: Optional[LLMCache] = None,
+        llm_string: Optional[str] = None
+    ):
+        """Initialize the wrapper.
+
+        Args:
+            llm: The language model to wrap
+            cache: The cache to use; a new exact-match cache by default
+            llm_string: Identifies the model and its settings in cache keys; by
+                default taken from the model, so another runner of the same
+                model (e.g. the Batch API) can pass it to share responses
+        """
+        self.llm = llm
+        self.cache = cache if cache is not None else LLMCache()
+        if llm_string is None:
+            get_llm_string = getattr(llm, "_get_llm_string", None)
+            llm_string = get_llm_string() if get_llm_string is not None else type(llm).__name__
+        self.llm_string = llm_string
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _to_messages(self, input: LanguageModelInput) -> List[BaseMessage]:
+        """Convert a prompt value, string or message list to a message list."""
+        if isinstance(input, list) and all(isinstance(message, BaseMessage) for message in input):
+            return input
+        return self.llm._convert_input(input).to_messages()
+
+    def invoke(
+        self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> BaseMessage:
+        """Invoke the model synchronously, without the cache."""
+        return self.llm.invoke(input, config, **kwargs)
+
+    async def ainvoke(
+        self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> BaseMessage:
+        """Invoke the model, returning a cached response when available."""
+        if kwargs:
+            return await self.llm.ainvoke(input, config, **kwargs)
+
+        messages = self._to_messages(input)
+        cached = await self.cache.get(messages, self.llm_string)
+        if cached is not None:
+            return cached
+        response = await self.llm.ainvoke(messages, config)
+        await self.cache.set(messages, response, self.llm_string)
+        return response
+
+    async def astream(
+        self, input: LanguageModelInput, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[BaseMessage]:
+        """Stream the model's response, replaying a cached response as one chunk.
+
+        A streamed response is only cached once the stream is fully consumed.
+        """
+        if kwargs:
+            async for chunk in self.llm.astream(input, config, **kwargs):
+                yield chunk
+            return
+
+        messages = self._to_messages(input)
+        cached = await self.cache.get(messages, self.llm_string)
+        if cached is not None:
+            yield AIMessageChunk(content=cached.content)
+            return
+
+        chunks = []
+        async for chunk in self.llm.astream(messages, config):
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            response = chunks[0]
+            for chunk in chunks[1:]:
+                response = response + chunk
+            await self.cache.set(messages, response, self.llm_string)
+
+    async def abatch(
+        self,
+        inputs: List[LanguageModelInput],
+        config: Optional[Any] = None,
+        **kwargs: Any
+    ) -> List[Any]:
+        """Invoke the model on several inputs, only sending each distinct uncached one once."""
+        inputs = [self._to_messages(input) for input in inputs]
+        results: List[Any] = [await self.cache.get(messages, self.llm_string) for messages in inputs]
+        misses = [index for index, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+
+        firsts, mapping = coalesce([messages_key(inputs[index]) for index in misses])
+        unique = [misses[first] for first in firsts]
+        if isinstance(config, list):
+            config = [config[index] for index in unique]
+        responses = await self.llm.abatch([inputs[index] for index in unique], config, **kwargs)
+        for index, response in zip(unique, responses):
+            if isinstance(response, BaseMessage):
+                await self.cache.set(inputs[index], response, self.llm_string)
+        for index, position in zip(misses, mapping):
+            results[index] = responses[position]
+        return results
@@ -4,10 +4,10 @@ import asyncio
 from pathlib import Path
 import json
 
+from src.agents import base
 from src.agents.base import RecursiveAgent
-from src.config import PROJECT_ROOT
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def test_config():
     """Test configuration fixture."""
     return {
@@ -16,11 +16,27 @@ def test_config():
         "max_tokens": 2000
     }
 
-@pytest.fixture
-def agent(test_config):
-    """RecursiveAgent fixture."""
+@pytest.fixture(scope="session")
+def shared_agent(test_config):
+    """RecursiveAgent built once, so its LLM client and connections are reused by all tests."""
     return RecursiveAgent(config_overrides=test_config)
 
+@pytest.fixture
+def memlog_dir(tmp_path, monkeypatch):
+    """Per-test memlog directory, so tests running in parallel do not share state files."""
+    memlog = tmp_path / "memlog"
+    memlog.mkdir()
+    monkeypatch.setattr(base, "STATE_FILE", memlog / "project_state.json")
+    monkeypatch.setattr(base, "HISTORY_FILE", memlog / "development_history.json")
+    monkeypatch.setattr(base, "HISTORY_DB_FILE", memlog / "development_history.db")
+    return memlog
+
+@pytest.fixture
+def agent(shared_agent, memlog_dir):
+    """RecursiveAgent fixture, reset to a fresh state, history and caches for each test."""
+    shared_agent.reset()
+    return shared_agent
+
 @pytest.mark.asyncio
 async def test_agent_initialization(agent):
     """Test agent initialization."""
@@ -41,14 +57,14 @@ async def test_process_request(agent):
     assert result["state"]["current_phase"] in ["planning", "implementing", "enhancing"]
 
 @pytest.mark.asyncio
-async def test_state_persistence(agent):
+async def test_state_persistence(agent, memlog_dir):
     """Test state persistence."""
     # Process a request
     request = "Create a simple calculator"
     result = await agent.process_request(request)
     
     # Verify state was saved
-    state_file = PROJECT_ROOT / "memlog" / "project_state.json"
+    state_file = memlog_dir / "project_state.json"
     assert state_file.exists()
     
     # Load and verify state
@@ -80,12 +96,14 @@ async def test_tool_execution(agent):
     assert len(agent.tools) > 0
     
     # Verify each tool type is present
-    tool_names = [tool.tool.name for tool in agent.tools]
-    assert any("generate_code" in name for name in tool_names)
-    assert any("analyze_code" in name for name in tool_names)
-    assert any("read_file" in name for name in tool_names)
-    assert any("write_file" in name for name in tool_names)
-    assert any("analyze_project_structure" in name for name in tool_names)
+    tool_names = {tool.tool.name for tool in agent.tools}
+    assert {
+        "generate_code",
+        "analyze_code",
+        "read_file",
+        "write_file",
+        "analyze_project_structure"
+    }.issubset(tool_names)
 
 def test_error_handling(agent):
     """Test error handling with invalid requests."""
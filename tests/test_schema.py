@@ -0,0 +1,95 @@
+"""Tests for the project state schema."""
+from collections import deque
+
+import pytest
+
+from src.state.schema import (
+    MAX_ACTION_HISTORY_LENGTH,
+    MAX_HISTORY_LENGTH,
+    MAX_TEST_RESULTS_PER_COMPONENT,
+    ActionDecision,
+    ProjectState,
+    TestResult,
+    bounded_test_results
+)
+
+def result(path, passed=True, suggestions=(), execution_time=0.0):
+    """Build a test result."""
+    return TestResult(
+        component_path=path,
+        status="completed",
+        passed=passed,
+        execution_time=execution_time,
+        suggestions=list(suggestions)
+    )
+
+def test_histories_are_bounded():
+    """Test that histories given as lists are bounded to their latest entries."""
+    state = ProjectState(
+        original_requirements="Build a calculator",
+        development_history=[{"step": step} for step in range(MAX_HISTORY_LENGTH + 5)]
+    )
+
+    assert state.development_history.maxlen == MAX_HISTORY_LENGTH
+    assert state.development_history[0] == {"step": 5}
+
+    for step in range(MAX_ACTION_HISTORY_LENGTH + 1):
+        state.action_history.append(ActionDecision(action_type="analyze", description=str(step)))
+    assert len(state.action_history) == MAX_ACTION_HISTORY_LENGTH
+
+def test_bounded_histories_are_kept():
+    """Test that revalidating a state does not copy its bounded histories."""
+    state = ProjectState(
+        original_requirements="Build a calculator",
+        test_results={"output/main.py": [result("output/main.py")]}
+    )
+    revalidated = ProjectState(**dict(state))
+
+    assert revalidated.development_history is state.development_history
+    assert revalidated.action_history is state.action_history
+    assert revalidated.test_results is state.test_results
+
+def test_test_results_are_bounded():
+    """Test that only the latest test results of each component are kept."""
+    results = [result("output/main.py", execution_time=float(index)) for index in range(20)]
+    state = ProjectState(
+        original_requirements="Build a calculator",
+        test_results={"output/main.py": [test_result.model_dump() for test_result in results]}
+    )
+
+    history = state.test_results["output/main.py"]
+    assert isinstance(history, deque)
+    assert history.maxlen == MAX_TEST_RESULTS_PER_COMPONENT
+    assert list(history) == results[-MAX_TEST_RESULTS_PER_COMPONENT:]
+
+def test_latest_test_results_are_indexed():
+    """Test that the latest result of each component and the failing components are derived."""
+    state = ProjectState(
+        original_requirements="Build a calculator",
+        test_results={
+            "output/fixed.py": bounded_test_results([result("output/fixed.py", passed=False), result("output/fixed.py")]),
+            "output/broken.py": [result("output/broken.py", passed=False)],
+            "output/styled.py": [result("output/styled.py", suggestions=["Add type hints"])],
+            "output/empty.py": []
+        }
+    )
+
+    assert state.latest_test_results["output/fixed.py"].passed
+    assert "output/empty.py" not in state.latest_test_results
+    assert state.failing_paths == {"output/broken.py", "output/styled.py"}
+
+def test_dump_round_trip():
+    """Test that histories dump as lists and derived fields are left out."""
+    state = ProjectState(
+        original_requirements="Build a calculator",
+        test_results={"output/main.py": [result("output/main.py", passed=False)]}
+    )
+    dump = state.model_dump()
+
+    assert isinstance(dump["test_results"]["output/main.py"], list)
+    assert isinstance(dump["development_history"], list)
+    assert "latest_test_results" not in dump and "failing_paths" not in dump
+    assert ProjectState(**dump).failing_paths == {"output/main.py"}
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,289 @@
+"""Tests for the workflow caches, stores and supervisor decision rules."""
+import pytest
+import orjson
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from src.state.schema import ActionDecision, CodeComponent, CodeGenerationStatus, ProjectState, TestResult
+from src.workflows import llm_cache
+from src.workflows.ai_workflow import AIControlledWorkflow, AIWorkflowSupervisor
+from src.workflows.batch import BatchProcessor
+from src.workflows.decision_cache import DecisionTemplateCache
+from src.workflows.history_store import HistoryStore
+from src.workflows.incremental_json import IncrementalJsonParser
+from src.workflows.llm_cache import CachedChatLLM, LLMCache
+
+class MappedEmbeddings(Embeddings):
+    """Embeddings looked up from a fixed table of texts."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+def prompt(text, system="You are a code generator."):
+    """Build a system/user prompt."""
+    return [SystemMessage(content=system), HumanMessage(content=text)]
+
+@pytest.fixture
+def supervisor():
+    """Supervisor whose LLM must not be called by the tested code paths."""
+    return AIWorkflowSupervisor(FakeListChatModel(responses=["unused"]))
+
+def component(path, content="print('hello')"):
+    """Build a Python code component."""
+    return CodeComponent(file_path=path, content=content, language="python")
+
+def result_for(comp, passed=True, suggestions=()):
+    """Build a test result of a component's current content."""
+    return TestResult(
+        component_path=comp.file_path,
+        status="completed",
+        passed=passed,
+        execution_time=0.0,
+        suggestions=list(suggestions),
+        tested_hash=comp.content_hash
+    )
+
+@pytest.mark.asyncio
+async def test_llm_cache_exact_hit_and_miss():
+    """Test that only the same messages sent to the same model hit the cache."""
+    cache = LLMCache()
+    response = AIMessage(content="cached")
+    await cache.set(prompt("build a parser"), response, "model-a")
+
+    assert await cache.get(prompt("build a parser"), "model-a") is response
+    assert await cache.get(prompt("build a lexer"), "model-a") is None
+    assert await cache.get(prompt("build a parser"), "model-b") is None
+
+    cache.clear()
+    assert await cache.get(prompt("build a parser"), "model-a") is None
+
+@pytest.mark.asyncio
+async def test_llm_cache_entries_expire(monkeypatch):
+    """Test that entries are not returned once their ttl has passed."""
+    now = [100.0]
+    monkeypatch.setattr(llm_cache.time, "monotonic", lambda: now[0])
+    cache = LLMCache(ttl=10)
+    await cache.set(prompt("build a parser"), AIMessage(content="cached"))
+
+    now[0] += 5
+    assert await cache.get(prompt("build a parser")) is not None
+    now[0] += 10
+    assert await cache.get(prompt("build a parser")) is None
+
+@pytest.mark.asyncio
+async def test_llm_cache_semantic_hit_and_miss():
+    """Test that a similar last message hits the cache only after identical preceding messages."""
+    embedder = MappedEmbeddings({
+        "build a parser": [1.0, 0.0],
+        "build a parser please": [0.99, 0.1],
+        "write documentation": [0.0, 1.0]
+    })
+    cache = LLMCache(embedder=embedder, similarity_threshold=0.9)
+    response = AIMessage(content="cached")
+    await cache.set(prompt("build a parser"), response)
+
+    assert await cache.get(prompt("build a parser please")) is response
+    assert await cache.get(prompt("write documentation")) is None
+    assert await cache.get(prompt("build a parser please", system="You are a tester.")) is None
+
+@pytest.mark.asyncio
+async def test_cached_chat_llm_serves_repeated_prompts():
+    """Test that a repeated prompt is answered from the cache without calling the model."""
+    llm = CachedChatLLM(FakeListChatModel(responses=["first", "second"]), LLMCache())
+
+    assert (await llm.ainvoke(prompt("build a parser"))).content == "first"
+    assert (await llm.ainvoke(prompt("build a parser"))).content == "first"
+    assert (await llm.ainvoke(prompt("build a lexer"))).content == "second"
+
+def test_incremental_json_parser_split_chunks():
+    """Test parsing an object split across chunks with braces and quotes inside strings."""
+    text = (
+        'Here is the file:\n{"file_path": "output/main.py", '
+        '"content": "def f():\\n    return {\\"a\\": [1, 2]}", "dependencies": []}'
+        '\nLet me know if you need anything else {}.'
+    )
+    parser = IncrementalJsonParser()
+    chunks = [text[index:index + 7] for index in range(0, len(text), 7)]
+    completed = [parser.feed(chunk) for chunk in chunks]
+
+    assert completed[-1]
+    assert completed.index(True) < len(chunks) - 1  # Complete before the trailing prose
+    assert parser.result() == {
+        "file_path": "output/main.py",
+        "content": 'def f():\n    return {"a": [1, 2]}',
+        "dependencies": []
+    }
+    assert parser.text.startswith("{") and parser.text.endswith("}")
+
+def test_incremental_json_parser_incomplete_and_invalid():
+    """Test that incomplete and malformed objects are reported as errors."""
+    parser = IncrementalJsonParser()
+    assert not parser.feed('Sure: {"content": "unterminated }')
+    with pytest.raises(ValueError):
+        parser.result()
+
+    parser = IncrementalJsonParser()
+    assert parser.feed("{'single': 'quotes'}")
+    with pytest.raises(ValueError):
+        parser.result()
+
+def test_history_store_round_trip(tmp_path):
+    """Test that entries written to the store are read back in order after reopening."""
+    path = tmp_path / "history.db"
+    store = HistoryStore(path)
+    store.append(1, {"action_type": "analyze"}, {"output": {"insights": []}}, 1_000)
+    store.append(2, {"action_type": "generate"}, [{"error": "failed"}], 2_000)
+    store.close()
+
+    store = HistoryStore(path)
+    assert len(store) == 2
+    assert list(store) == [
+        {"step": 1, "timestamp_ns": 1_000, "action": {"action_type": "analyze"}, "result": {"output": {"insights": []}}},
+        {"step": 2, "timestamp_ns": 2_000, "action": {"action_type": "generate"}, "result": [{"error": "failed"}]}
+    ]
+    store.close()
+
+@pytest.mark.asyncio
+async def test_decision_cache_store_lookup_and_invalidate():
+    """Test that decisions are reused for the same situation until invalidated."""
+    cache = DecisionTemplateCache()
+    state = ProjectState(original_requirements="Build a calculator", step_count=1)
+    decision = ActionDecision(action_type="generate", description="Create the calculator")
+
+    key = await cache.key(state, "decision prompt")
+    assert cache.lookup(key) is None
+    cache.store(key, decision)
+    assert cache.lookup(key) == decision
+    assert cache.lookup(key) is not decision  # Callers get their own copy
+
+    other_state = ProjectState(original_requirements="Build a todo list", step_count=1)
+    assert cache.lookup(await cache.key(other_state, "decision prompt")) is None
+
+    cache.invalidate(decision)
+    assert cache.lookup(key) is None
+
+def test_batch_processor_round_trip():
+    """Test that batch requests are encoded per line and results matched back by id."""
+    processor = BatchProcessor(client=None, model="gpt-4o-mini", request_params={"temperature": 0.0})
+    lines = processor._build_batch_file([prompt("first"), prompt("second")]).split(b"\n")
+
+    assert [orjson.loads(line)["custom_id"] for line in lines] == ["0", "1"]
+    assert orjson.loads(lines[0])["body"] == {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "You are a code generator."},
+            {"role": "user", "content": "first"}
+        ],
+        "temperature": 0.0
+    }
+
+    output = b"\n".join([
+        orjson.dumps({"custom_id": "1", "response": {"status_code": 500, "body": "overloaded"}}),
+        orjson.dumps({
+            "custom_id": "0",
+            "response": {"status_code": 200, "body": {"choices": [{"message": {"content": "done"}}]}}
+        })
+    ]).decode()
+    results = processor._parse_batch_output(output, 2)
+    assert results[0].content == "done"
+    assert isinstance(results[1], RuntimeError)
+
+def test_fast_path_analyzes_new_project(supervisor):
+    """Test that a new project starts with an analysis."""
+    state = ProjectState(original_requirements="Build a calculator")
+
+    assert supervisor._fast_path_decision(state).action_type == "analyze"
+
+def test_fast_path_tests_new_and_changed_components(supervisor):
+    """Test that untested and changed components are tested first."""
+    tested = component("output/tested.py")
+    changed = component("output/changed.py")
+    state = ProjectState(
+        original_requirements="Build a calculator",
+        step_count=2,
+        components={
+            "output/new.py": component("output/new.py"),
+            "output/tested.py": tested,
+            "output/changed.py": component("output/changed.py", "print('changed')")
+        },
+        test_results={
+            "output/tested.py": [result_for(tested)],
+            "output/changed.py": [result_for(changed)]
+        }
+    )
+
+    decision = supervisor._fast_path_decision(state)
+    assert decision.action_type == "test"
+    assert decision.context["relevant_files"] == ["output/new.py", "output/changed.py"]
+
+def test_fast_path_completes_when_all_tests_pass(supervisor):
+    """Test that the project completes once every component passes its current test."""
+    comp = component("output/main.py")
+    state = ProjectState(
+        original_requirements="Build a calculator",
+        step_count=3,
+        components={"output/main.py": comp},
+        test_results={"output/main.py": [result_for(comp, passed=False), result_for(comp)]}
+    )
+
+    assert supervisor._fast_path_decision(state).action_type == "complete"
+
+@pytest.mark.parametrize("passed, suggestions", [(False, []), (True, ["Add docstrings"])])
+def test_fast_path_leaves_refinement_to_the_llm(supervisor, passed, suggestions):
+    """Test that failing components and open suggestions are left to the LLM."""
+    comp = component("output/main.py")
+    state = ProjectState(
+        original_requirements="Build a calculator",
+        step_count=3,
+        components={"output/main.py": comp},
+        test_results={"output/main.py": [result_for(comp, passed, suggestions)]}
+    )
+
+    assert supervisor._fast_path_decision(state) is None
+
+def generating_workflow(steps):
+    """Build a workflow whose LLM decides to generate a file at every step."""
+    decision = orjson.dumps({
+        "insights": [],
+        "recommendations": [],
+        "priority_actions": [],
+        "metadata": {"decision": {"action_type": "generate", "description": "Create the calculator"}}
+    }).decode()
+    generated = orjson.dumps({"file_path": "output/main.py", "content": "print(1)", "language": "python"}).decode()
+    workflow = AIControlledWorkflow(FakeListChatModel(responses=[decision, generated] * steps))
+    workflow.ai_supervisor.fast_path = False
+    return workflow
+
+@pytest.mark.asyncio
+async def test_streamed_states_are_snapshots():
+    """Test that a streamed state is not changed by the steps after it."""
+    workflow = generating_workflow(3)
+
+    states = [state async for state in workflow.astream_steps(
+        ProjectState(original_requirements="Build a calculator", max_steps=3)
+    )]
+
+    assert [len(state["action_history"]) for state in states] == [0, 1, 2, 3, 3]
+    assert [len(state["development_history"]) for state in states] == [0, 1, 2, 3, 3]
+    assert "output/main.py" not in states[0]["components"]
+
+@pytest.mark.asyncio
+async def test_history_store_failure_does_not_fail_the_step(tmp_path):
+    """Test that a step succeeds even if its history store cannot be written."""
+    state = ProjectState(original_requirements="Build a calculator", history_store_path=str(tmp_path))
+
+    updates = await generating_workflow(1).ai_supervisor.execute_step_updates(state)
+
+    assert updates["status"] == CodeGenerationStatus.IN_PROGRESS
+    assert "output/main.py" in updates["components"]
+    assert not state.error_log
+
+if __name__ == "__main__":
+    pytest.main([__file__])